@@ -0,0 +1,33 @@
+from typing import Dict, Tuple
+
+import numpy as np
+from fastapi.responses import Response
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+
+def accepts_arrow(header: str) -> bool:
+    return ARROW_STREAM in (header or "")
+
+
+def read_arrow_columns(body: bytes) -> Tuple[Dict[str, np.ndarray], int]:
+    # pyarrow is only needed by clients that send Arrow IPC
+    import pyarrow as pa
+
+    table = pa.ipc.open_stream(body).read_all()
+    # Numeric columns without nulls come back as zero-copy views over the IPC buffers
+    columns = {
+        name: table.column(name).to_numpy(zero_copy_only=False)
+        for name in table.column_names
+    }
+    return columns, table.num_rows
+
+
+def arrow_response(columns: Dict[str, object], status_code: int = 200) -> Response:
+    import pyarrow as pa
+
+    table = pa.table(columns)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return Response(content=sink.getvalue().to_pybytes(), status_code=status_code, media_type=ARROW_STREAM)
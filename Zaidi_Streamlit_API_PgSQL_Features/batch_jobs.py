@@ -0,0 +1,224 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from feature_validation import VALIDATORS
+from model_registry import registry
+from model_runner import build_overall_columns, format_predictions, run_inference, run_inference_columns
+from prediction_cache import feature_hashes, prediction_cache
+from prediction_writer import prediction_writer
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = Path(os.getenv("BATCH_JOBS_DIR", os.path.join(os.path.dirname(__file__), "batch_jobs")))
+JOB_CHUNK_ROWS = int(os.getenv("BATCH_JOB_CHUNK_ROWS", "10000"))
+JOB_WORKERS = int(os.getenv("BATCH_JOB_WORKERS", "2"))
+# Jobs untouched for this long are deleted with their files; the sweep runs every CLEANUP_INTERVAL
+JOB_TTL = float(os.getenv("BATCH_JOB_TTL_SECONDS", str(24 * 3600)))
+CLEANUP_INTERVAL = float(os.getenv("BATCH_JOB_CLEANUP_INTERVAL", "600"))
+
+
+@dataclass
+class BatchJob:
+    job_id: str
+    model: str
+    schema_version: Optional[str] = None  # FIFA jobs validate rows and predict `overall`
+    state: str = "uploading"  # uploading -> queued -> running -> done | failed
+    uploaded_bytes: int = 0
+    rows_processed: int = 0
+    error: Optional[str] = None
+    updated_at: float = field(default_factory=time.time)
+    # Serializes uploads and state changes of this job only; other jobs upload in parallel
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def directory(self) -> Path:
+        return JOBS_DIR / self.job_id
+
+    @property
+    def input_path(self) -> Path:
+        return self.directory / "input.csv"
+
+    @property
+    def result_path(self) -> Path:
+        return self.directory / "predictions.csv"
+
+    @property
+    def metadata_path(self) -> Path:
+        return self.directory / "job.json"
+
+    def to_dict(self):
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.name != "lock"}
+
+    def save(self):
+        # Metadata lives next to the job's files so jobs survive a restart; written atomically
+        self.updated_at = time.time()
+        tmp = self.metadata_path.with_suffix(".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, self.metadata_path)
+
+    @classmethod
+    def load(cls, directory: Path) -> "BatchJob":
+        with open(directory / "job.json") as f:
+            job = cls(**json.load(f))
+        # The file on disk is the truth for how much was uploaded (a crash can land between
+        # the write and the metadata update)
+        job.uploaded_bytes = job.input_path.stat().st_size if job.input_path.exists() else 0
+        return job
+
+
+class BatchJobManager:
+    def __init__(self, workers: int = JOB_WORKERS):
+        self._jobs: Dict[str, BatchJob] = {}
+        self._lock = threading.Lock()  # guards the job dict only
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-job")
+        self._stop = threading.Event()
+        self._janitor: Optional[threading.Thread] = None
+
+    def create(self, model: str, schema_version: Optional[str] = None) -> BatchJob:
+        job = BatchJob(job_id=uuid.uuid4().hex, model=model, schema_version=schema_version)
+        job.directory.mkdir(parents=True, exist_ok=True)
+        job.input_path.touch()
+        job.save()
+        with self._lock:
+            self._jobs[job.job_id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[BatchJob]:
+        return self._jobs.get(job_id)
+
+    def load_all(self):
+        # Pick up jobs from before a restart: uploads resume where the file ends, and jobs that
+        # were queued or running start over (their partial output is discarded)
+        if not JOBS_DIR.exists():
+            return
+        for directory in JOBS_DIR.iterdir():
+            if not (directory / "job.json").exists():
+                continue
+            try:
+                job = BatchJob.load(directory)
+            except Exception as e:
+                logger.error("Could not load batch job %s: %s", directory.name, e)
+                continue
+            with self._lock:
+                self._jobs[job.job_id] = job
+            if job.state in ("queued", "running"):
+                job.result_path.unlink(missing_ok=True)
+                job.rows_processed = 0
+                job.state = "queued"
+                job.save()
+                self._executor.submit(self._run, job)
+        logger.info("Loaded %d batch job(s)", len(self._jobs))
+
+    def append_chunk(self, job: BatchJob, offset: int, data: bytes) -> int:
+        # Resumable upload: a chunk is only accepted at the current end of the file, so a client
+        # that lost its connection asks for uploaded_bytes and continues from there
+        with job.lock:
+            if job.state != "uploading":
+                raise ValueError(f"Job is {job.state}, uploads are closed")
+            if offset != job.uploaded_bytes:
+                raise ValueError(f"Expected offset {job.uploaded_bytes}")
+            with open(job.input_path, "ab") as f:
+                f.write(data)
+            job.uploaded_bytes += len(data)
+            job.save()
+            return job.uploaded_bytes
+
+    def start(self, job: BatchJob):
+        with job.lock:
+            if job.state != "uploading":
+                raise ValueError(f"Job is already {job.state}")
+            job.state = "queued"
+            job.save()
+        self._executor.submit(self._run, job)
+
+    def _run(self, job: BatchJob):
+        job.state = "running"
+        job.save()
+        try:
+            # Parse and score in fixed-size chunks; results are appended to the output file as they come
+            header = True
+            for chunk in pd.read_csv(job.input_path, chunksize=JOB_CHUNK_ROWS):
+                predictions = self._score(job, chunk)
+                predictions.pop("index", None)
+                chunk.assign(**predictions).to_csv(job.result_path, mode="a", header=header, index=False)
+                header = False
+                job.rows_processed += len(chunk)
+                job.save()
+            job.state = "done"
+        except Exception as e:
+            logger.error("Batch job %s failed: %s", job.job_id, e)
+            job.error = str(e)
+            job.state = "failed"
+        job.save()
+
+    def cleanup_expired(self, ttl: float = JOB_TTL) -> int:
+        # Queued and running jobs are never removed from under their worker
+        cutoff = time.time() - ttl
+        with self._lock:
+            expired = [
+                job for job in self._jobs.values()
+                if job.state not in ("queued", "running") and job.updated_at < cutoff
+            ]
+            for job in expired:
+                del self._jobs[job.job_id]
+        for job in expired:
+            shutil.rmtree(job.directory, ignore_errors=True)
+        if expired:
+            logger.info("Removed %d expired batch job(s)", len(expired))
+        return len(expired)
+
+    def _clean_periodically(self):
+        while not self._stop.wait(CLEANUP_INTERVAL):
+            try:
+                self.cleanup_expired()
+            except Exception as e:
+                logger.error("Batch job cleanup failed: %s", e)
+
+    def start_janitor(self):
+        if CLEANUP_INTERVAL <= 0 or self._janitor is not None:
+            return
+        self._stop.clear()
+        self._janitor = threading.Thread(target=self._clean_periodically, name="batch-job-janitor", daemon=True)
+        self._janitor.start()
+
+    def _score(self, job: BatchJob, chunk: pd.DataFrame) -> dict:
+        if job.schema_version is None:
+            records = chunk.to_dict(orient="records")
+            return format_predictions(records, run_inference(records, job.model))
+        # Invalid rows stay in the output with an error instead of failing the whole job
+        validator = VALIDATORS[job.schema_version]
+        columns = {col: chunk[col].to_numpy() for col in validator.columns + ["player_id"] if col in chunk.columns}
+        matrix = validator.numeric_matrix(columns, len(chunk))
+        valid, errors = validator.validate(columns, len(chunk), matrix)
+        entry = registry.get(job.model)
+        valid_rows = np.flatnonzero(valid)
+        keys = feature_hashes(validator, columns, matrix[0], valid_rows)
+        y_pred, hit = prediction_cache.get_many(entry.name, entry.version, keys)
+        miss = np.flatnonzero(~hit)
+        if len(miss):
+            rows = valid_rows[miss]
+            miss_columns = {col: values[rows] for col, values in columns.items()}
+            y_pred[miss] = run_inference_columns(miss_columns, len(rows), job.model)
+            prediction_cache.put_many(entry.name, entry.version, [keys[i] for i in miss], y_pred[miss])
+        prediction_writer.enqueue(entry.name, entry.version, columns, valid_rows, y_pred)
+        return build_overall_columns(valid, y_pred, errors)
+
+    def shutdown(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+batch_jobs = BatchJobManager()
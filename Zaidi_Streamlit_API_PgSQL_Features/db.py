@@ -1,53 +1,219 @@
+import asyncio
+import csv
+import io
+import os
+import threading
+import time
+from contextlib import contextmanager
+
 import psycopg2
 import bcrypt
+from psycopg2 import errors
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+
+DB_NAME = os.getenv("DB_NAME", "mvp_app")
+DB_USER = os.getenv("DB_USER", "postgres")
+DB_PASS = os.getenv("DB_PASS", "Sql.123")
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_PORT = os.getenv("DB_PORT", "5432")
+
+# Pool settings
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))  # seconds to wait for a free connection
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "5000"))
+DB_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_HEALTH_CHECK_INTERVAL", "30"))  # ping connections idle longer than this
+
+class DatabaseBusy(Exception):
+    pass
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+_last_used = {}
+
+def _get_pool() -> ThreadedConnectionPool:
+    # Created lazily so importing this module never needs a reachable database
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(
+                    DB_POOL_MIN,
+                    DB_POOL_MAX,
+                    dbname=DB_NAME,
+                    user=DB_USER,
+                    password=DB_PASS,
+                    host=DB_HOST,
+                    port=DB_PORT,
+                    options=f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}",
+                )
+    return _pool
+
+def _is_healthy(conn) -> bool:
+    if conn.closed:
+        return False
+    if time.monotonic() - _last_used.get(id(conn), 0) < DB_HEALTH_CHECK_INTERVAL:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+def _release(conn, broken: bool = False):
+    _last_used[id(conn)] = time.monotonic()
+    if broken or conn.closed:
+        _last_used.pop(id(conn), None)
+    _get_pool().putconn(conn, close=broken or bool(conn.closed))
+    _pool_slots.release()
 
-DB_NAME = "mvp_app"
-DB_USER = "postgres"
-DB_PASS = "Sql.123"
-DB_HOST = "localhost"
-DB_PORT = "5432"
+def _checkout():
+    # ThreadedConnectionPool raises instead of waiting when exhausted, so bound callers here
+    if not _pool_slots.acquire(timeout=DB_POOL_TIMEOUT):
+        raise DatabaseBusy("Database is busy, try again later")
+    try:
+        # Inside the try: if the database is down the slot is released, so callers can reconnect later
+        pool = _get_pool()
+        conn = pool.getconn()
+        if not _is_healthy(conn):
+            # Dropped connection: discard it and let the pool open a fresh one
+            _last_used.pop(id(conn), None)
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+        return conn
+    except Exception:
+        _pool_slots.release()
+        raise
 
-conn = psycopg2.connect(
-    dbname=DB_NAME,
-    user=DB_USER,
-    password=DB_PASS,
-    host=DB_HOST,
-    port=DB_PORT
-)
+@contextmanager
+def get_cursor(name: str = None, statement_timeout_ms: int = None):
+    # name opens a server-side cursor, so large results are fetched in batches of cur.itersize;
+    # statement_timeout_ms overrides DB_STATEMENT_TIMEOUT_MS for this transaction (0 = no limit)
+    conn = _checkout()
+    broken = False
+    try:
+        if statement_timeout_ms is not None:
+            with conn.cursor() as cur:
+                cur.execute("SET LOCAL statement_timeout = %s", (statement_timeout_ms,))
+        with conn.cursor(name=name, cursor_factory=RealDictCursor) as cur:
+            yield cur
+        conn.commit()
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        _release(conn, broken)
+
+@contextmanager
+def dedicated_cursor(name: str = None, statement_timeout_ms: int = 0):
+    # A connection of its own, outside the pool: a long stream (e.g. an export to a slow client)
+    # never holds a pool slot that /login and /predict need
+    conn = psycopg2.connect(
+        dbname=DB_NAME,
+        user=DB_USER,
+        password=DB_PASS,
+        host=DB_HOST,
+        port=DB_PORT,
+        options=f"-c statement_timeout={statement_timeout_ms}",
+    )
+    try:
+        with conn.cursor(name=name, cursor_factory=RealDictCursor) as cur:
+            yield cur
+        conn.commit()
+    finally:
+        conn.close()
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _last_used.clear()
+
+# Constraint names Postgres generates for the UNIQUE columns of users
+UNIQUE_VIOLATION_MESSAGES = {
+    "users_username_key": "Username already exists",
+    "users_email_key": "Email already exists",
+}
 
 def hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
-def create_user(user_data):
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+def create_user(user_data, hashed_pw: str = None):
+    # Callers on the request path hash beforehand (off the event loop) and pass hashed_pw in
+    if hashed_pw is None:
+        hashed_pw = hash_password(user_data.password)
 
-    cur.execute("SELECT id FROM users WHERE username = %s", (user_data.username,))
-    if cur.fetchone():
-        cur.close()
-        raise Exception("Username already exists")
+    # One round trip: the unique constraints on users (see schema.sql) do the duplicate checks
+    with get_cursor() as cur:
+        try:
+            cur.execute("""
+                INSERT INTO users (username, email, full_name, hashed_password, role, created_at)
+                VALUES (%s, %s, %s, %s, %s, NOW())
+                RETURNING id, username, email, full_name, role, created_at
+            """, (user_data.username, user_data.email, user_data.full_name, hashed_pw, "user"))
+        except errors.UniqueViolation as e:
+            raise Exception(UNIQUE_VIOLATION_MESSAGES.get(e.diag.constraint_name, "User already exists"))
 
-    cur.execute("SELECT id FROM users WHERE email = %s", (user_data.email,))
-    if cur.fetchone():
-        cur.close()
-        raise Exception("Email already exists")
+        return cur.fetchone()
 
-    hashed_pw = hash_password(user_data.password)
+def bulk_create_users(users: list):
+    # users: dicts with username, email, full_name, hashed_password and optionally role.
+    # Everything is COPYed into a temp table and inserted in one transaction; rows clashing
+    # with existing usernames/emails are skipped rather than failing the import. Callers dedupe
+    # the roster first, so "skipped" means the user already existed.
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for user in users:
+        writer.writerow([user["username"], user["email"], user["full_name"], user["hashed_password"], user.get("role", "user")])
+    buffer.seek(0)
 
-    cur.execute("""
-        INSERT INTO users (username, email, full_name, hashed_password, role, created_at)
-        VALUES (%s, %s, %s, %s, %s, NOW())
-        RETURNING id, username, email, full_name, role, created_at
-    """, (user_data.username, user_data.email, user_data.full_name, hashed_pw, "user"))
+    with get_cursor() as cur:
+        cur.execute("""
+            CREATE TEMP TABLE users_import (
+                username TEXT, email TEXT, full_name TEXT, hashed_password TEXT, role TEXT
+            ) ON COMMIT DROP
+        """)
+        cur.copy_expert("COPY users_import FROM STDIN WITH (FORMAT csv)", buffer)
+        cur.execute("""
+            INSERT INTO users (username, email, full_name, hashed_password, role, created_at)
+            SELECT username, email, full_name, hashed_password, role, NOW() FROM users_import
+            ON CONFLICT DO NOTHING
+            RETURNING username
+        """)
+        created = [row["username"] for row in cur.fetchall()]
 
-    user = cur.fetchone()
-    conn.commit()
-    cur.close()
-    return user
+    created_set = set(created)
+    skipped = [user["username"] for user in users if user["username"] not in created_set]
+    return {"created": created, "skipped": skipped}
 
 def get_user_by_username(username: str):
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    cur.execute("SELECT * FROM users WHERE username = %s", (username,))
-    user = cur.fetchone()
-    cur.close()
-    return user
+    with get_cursor() as cur:
+        cur.execute("SELECT * FROM users WHERE username = %s", (username,))
+        return cur.fetchone()
+
+def update_password_hash(user_id, hashed_pw: str):
+    with get_cursor() as cur:
+        cur.execute("UPDATE users SET hashed_password = %s WHERE id = %s", (hashed_pw, user_id))
+
+# asyncio-compatible variants: run the pooled sync calls on a worker thread
+# so async endpoints never block the event loop on a database round trip
+async def acreate_user(user_data, hashed_pw: str = None):
+    return await asyncio.to_thread(create_user, user_data, hashed_pw)
+
+async def aget_user_by_username(username: str):
+    return await asyncio.to_thread(get_user_by_username, username)
+
+async def abulk_create_users(users: list):
+    return await asyncio.to_thread(bulk_create_users, users)
+
+async def aupdate_password_hash(user_id, hashed_pw: str):
+    return await asyncio.to_thread(update_password_hash, user_id, hashed_pw)
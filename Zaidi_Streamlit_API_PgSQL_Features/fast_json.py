@@ -0,0 +1,35 @@
+import json
+from datetime import date, datetime
+
+import numpy as np
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+
+def _to_builtin(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {k: _to_builtin(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_builtin(v) for v in value]
+    return value
+
+
+def dumps(content) -> bytes:
+    # orjson serializes numeric NumPy arrays natively, so columnar payloads never become Python lists
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(_to_builtin(content)).encode("utf-8")
+
+
+def fast_json_response(content, status_code: int = 200):
+    return Response(dumps(content), status_code=status_code, media_type="application/json")
@@ -0,0 +1,38 @@
+# FIFA player feature set, kept in sync with EXPECTED_COLUMNS in airflow/dags/ingestion_dag.py
+NUMERIC_COLUMNS = [
+    "age", "height_cm", "weight_kg", "potential", "weak_foot", "skill_moves",
+    "pace", "shooting", "passing", "dribbling", "defending", "physic",
+    "attacking_crossing", "attacking_finishing", "attacking_heading_accuracy",
+    "attacking_short_passing", "attacking_volleys", "skill_dribbling",
+    "skill_curve", "skill_fk_accuracy", "skill_long_passing", "skill_ball_control",
+    "movement_acceleration", "movement_sprint_speed", "movement_agility",
+    "movement_reactions", "movement_balance", "power_shot_power", "power_jumping",
+    "power_stamina", "power_strength", "power_long_shots", "mentality_aggression",
+    "mentality_interceptions", "mentality_positioning", "mentality_vision",
+    "mentality_penalties", "mentality_composure", "defending_standing_tackle",
+    "defending_sliding_tackle",
+]
+
+CATEGORICAL_COLUMNS = {
+    "preferred_foot": ["Left", "Right"],
+    "main_position": ["GK", "CB", "LB", "RB", "CM", "CDM", "CAM", "LW", "RW", "ST"],
+    "att_work_rate": ["Low", "Medium", "High"],
+    "def_work_rate": ["Low", "Medium", "High"],
+    "nationality_grouped": ["Argentina", "Brazil", "Portugal", "Poland", "Other"],
+}
+
+EXPECTED_COLUMNS = NUMERIC_COLUMNS + list(CATEGORICAL_COLUMNS)
+
+# Value ranges from the ingestion expectation suite (inclusive)
+NUMERIC_RANGES = {
+    "age": (16, 40),
+    "height_cm": (160, 200),
+    "weight_kg": (55, 100),
+    "potential": (50, 95),
+    "weak_foot": (1, 5),
+    "skill_moves": (1, 5),
+}
+
+# Request schema versions accepted by /predict for the FIFA feature set
+SCHEMA_VERSION = "fifa-v1"
+DEFAULT_MODEL = "fifa_overall"
@@ -0,0 +1,74 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from feature_schema import CATEGORICAL_COLUMNS, NUMERIC_COLUMNS, NUMERIC_RANGES, SCHEMA_VERSION
+
+
+class FeatureValidator:
+    # Compiled once per schema version: range bounds as arrays and category sets as numpy arrays,
+    # so a batch is checked column by column instead of record by record
+    def __init__(self, numeric: List[str], categorical: Dict[str, List[str]], ranges: Dict[str, Tuple[float, float]]):
+        self.numeric = list(numeric)
+        self.categorical = {col: np.array(values, dtype=object) for col, values in categorical.items()}
+        # Position in the allowed list is a canonical code for a category (used by cache keys)
+        self.category_index = {col: pd.Index(values) for col, values in self.categorical.items()}
+        self.columns = self.numeric + list(self.categorical)
+        self.lower = np.array([ranges.get(col, (-np.inf, np.inf))[0] for col in self.numeric], dtype=np.float64)
+        self.upper = np.array([ranges.get(col, (-np.inf, np.inf))[1] for col in self.numeric], dtype=np.float64)
+
+    def columns_from_records(self, records: List[Dict]) -> Dict[str, list]:
+        return {col: [record.get(col) for record in records] for col in self.columns}
+
+    def numeric_matrix(self, columns: Dict, n_rows: int):
+        values = np.full((n_rows, len(self.numeric)), np.nan)
+        not_numeric = np.zeros((n_rows, len(self.numeric)), dtype=bool)
+        for i, col in enumerate(self.numeric):
+            if col not in columns:
+                continue
+            raw = np.asarray(columns[col])
+            if raw.dtype.kind in "iuf":
+                values[:, i] = raw
+                continue
+            # Strings/objects: coerce in one pass and flag values that were present but unparseable
+            raw = raw.astype(object)
+            values[:, i] = pd.to_numeric(raw, errors="coerce")
+            not_numeric[:, i] = np.isnan(values[:, i]) & ~pd.isna(raw)
+        return values, not_numeric
+
+    def validate(self, columns: Dict, n_rows: int, matrix=None) -> Tuple[np.ndarray, Dict[int, List[str]]]:
+        # Returns the mask of valid rows and, for every rejected row, its error messages;
+        # callers that need the numeric matrix too build it once and pass it in
+        failures = []
+        values, not_numeric = matrix if matrix is not None else self.numeric_matrix(columns, n_rows)
+        missing = np.isnan(values) & ~not_numeric
+        out_of_range = (values < self.lower) | (values > self.upper)
+        for i, col in enumerate(self.numeric):
+            failures.append((not_numeric[:, i], f"{col}: not a number"))
+            failures.append((missing[:, i], f"{col}: missing"))
+            low, high = NUMERIC_RANGES.get(col, (None, None))
+            failures.append((out_of_range[:, i], f"{col}: outside [{low}, {high}]"))
+
+        for col, allowed in self.categorical.items():
+            if col not in columns:
+                failures.append((np.ones(n_rows, dtype=bool), f"{col}: missing"))
+                continue
+            raw = np.asarray(columns[col], dtype=object)
+            failures.append((~np.isin(raw, allowed), f"{col}: not one of {allowed.tolist()}"))
+
+        valid = np.ones(n_rows, dtype=bool)
+        errors: Dict[int, List[str]] = {}
+        for mask, message in failures:
+            bad = np.flatnonzero(mask)
+            if not len(bad):
+                continue
+            valid[bad] = False
+            for row in bad.tolist():
+                errors.setdefault(row, []).append(message)
+        return valid, errors
+
+
+VALIDATORS = {
+    SCHEMA_VERSION: FeatureValidator(NUMERIC_COLUMNS, CATEGORICAL_COLUMNS, NUMERIC_RANGES),
+}
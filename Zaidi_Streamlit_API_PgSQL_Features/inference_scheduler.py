@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+
+from model_registry import UnknownModel, registry
+from model_runner import run_inference, run_inference_columns
+
+logger = logging.getLogger(__name__)
+
+# Coalesce queued requests until a batch holds this many rows or the oldest request waited this long
+MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "512"))
+MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "5"))
+WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+
+
+class InferenceScheduler:
+    def __init__(self, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS, workers: int = WORKERS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._batchers: Dict[str, asyncio.Task] = {}
+
+    async def predict(self, model_name: str, records: List[dict]) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        if not records:
+            return np.empty(0, dtype=np.float32)
+        # Checked before queueing: every queue name gets a batcher task that lives until shutdown
+        if not registry.known(model_name):
+            raise UnknownModel(f"Unknown model: {model_name}")
+
+        # Big uploads are already a batch of their own; run them without queueing behind others
+        if len(records) >= self.max_batch_size:
+            return await loop.run_in_executor(self._executor, run_inference, records, model_name)
+
+        name = registry.resolve(model_name)
+        future = loop.create_future()
+        await self._queue_for(name).put((records, future))
+        return await future
+
+    async def predict_columns(self, model_name: str, columns: Dict[str, np.ndarray], n_rows: int) -> np.ndarray:
+        # Columnar (Arrow) payloads come from bulk callers; they skip coalescing like large JSON requests
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, run_inference_columns, columns, n_rows, model_name)
+
+    def _queue_for(self, name: str) -> asyncio.Queue:
+        # One queue and batcher per model, since only requests for the same model can share a batch
+        if name not in self._queues:
+            self._queues[name] = asyncio.Queue()
+            self._batchers[name] = asyncio.create_task(self._run_batcher(name, self._queues[name]))
+        return self._queues[name]
+
+    async def _collect(self, queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        batch = [await queue.get()]
+        rows = len(batch[0][0])
+        deadline = loop.time() + self.max_wait
+
+        while rows < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    async def _run_batcher(self, name: str, queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect(queue)
+            records = [record for request_records, _ in batch for record in request_records]
+            try:
+                y_pred_proba = await loop.run_in_executor(self._executor, run_inference, records, name)
+            except Exception as e:
+                if len(batch) == 1:
+                    if not batch[0][1].done():
+                        batch[0][1].set_exception(e)
+                    continue
+                # One bad request must not fail the ones it was batched with: re-run each on its own
+                # so the error only reaches the request that caused it
+                for request_records, future in batch:
+                    try:
+                        result = await loop.run_in_executor(self._executor, run_inference, request_records, name)
+                    except Exception as request_error:
+                        if not future.done():
+                            future.set_exception(request_error)
+                    else:
+                        if not future.done():
+                            future.set_result(result)
+                continue
+
+            # Fan the batch result back out to each waiting request, in submission order
+            offset = 0
+            for request_records, future in batch:
+                end = offset + len(request_records)
+                if not future.done():
+                    future.set_result(y_pred_proba[offset:end])
+                offset = end
+
+    async def close(self):
+        for task in self._batchers.values():
+            task.cancel()
+        await asyncio.gather(*self._batchers.values(), return_exceptions=True)
+        self._queues.clear()
+        self._batchers.clear()
+        self._executor.shutdown(wait=False)
+
+
+scheduler = InferenceScheduler()
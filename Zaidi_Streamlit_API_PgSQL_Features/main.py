@@ -1,7 +1,19 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import csv
+import io
+import itertools
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
-from db import create_user, get_user_by_username
-from auth_utils import check_password, create_access_token
+from db import acreate_user, abulk_create_users, aget_user_by_username, aupdate_password_hash, close_pool
+from middleware import get_current_user, role_required
+from auth_utils import create_access_token
+from password_hasher import password_hasher, PasswordHasherBusy
 
 app = FastAPI()
 
@@ -15,10 +27,19 @@ class UserLogin(BaseModel):
     username: str
     password: str
 
+def hasher_busy(e: PasswordHasherBusy):
+    # Back-pressure: tell clients to retry rather than queueing logins behind a saturated pool
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
 @app.post("/register")
-def register(user_data: UserCreate):
+async def register(user_data: UserCreate):
+    try:
+        hashed_pw = await password_hasher.hash(user_data.password)
+    except PasswordHasherBusy as e:
+        raise hasher_busy(e)
+
     try:
-        user = create_user(user_data)
+        user = await acreate_user(user_data, hashed_pw)
         return {
             "status": "success",
             "user": {
@@ -33,18 +54,83 @@ def register(user_data: UserCreate):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+class BulkUserCreate(BaseModel):
+    users: List[UserCreate]
+    role: str = "user"
+
+@app.post("/users/bulk")
+async def bulk_register(payload: BulkUserCreate, admin=Depends(role_required(["admin"]))):
+    # Coach roster import: hash in worker-sized waves, then insert everything with one COPY.
+    # Repeated usernames/emails within the roster are dropped first (and never hashed), so
+    # "skipped" only lists users that already existed
+    roster, duplicates, seen = [], [], set()
+    for u in payload.users:
+        if u.username in seen or u.email in seen:
+            duplicates.append(u.username)
+            continue
+        seen.update((u.username, u.email))
+        roster.append(u)
+
+    hashed = []
+    try:
+        for start in range(0, len(roster), password_hasher.workers):
+            wave = roster[start:start + password_hasher.workers]
+            hashed += await asyncio.gather(*(password_hasher.hash(u.password) for u in wave))
+    except PasswordHasherBusy as e:
+        raise hasher_busy(e)
+
+    users = [
+        {"username": u.username, "email": u.email, "full_name": u.full_name, "hashed_password": h, "role": payload.role}
+        for u, h in zip(roster, hashed)
+    ]
+    try:
+        result = await abulk_create_users(users)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result["duplicates"] = duplicates
+    return result
+
 @app.post("/login")
-def login(user_data: UserLogin):
-    user = get_user_by_username(user_data.username)
-    if not user or not check_password(user_data.password, user["hashed_password"]):
+async def login(user_data: UserLogin):
+    user = await aget_user_by_username(user_data.username)
+    try:
+        valid = user is not None and await password_hasher.verify(user_data.password, user["hashed_password"])
+    except PasswordHasherBusy as e:
+        raise hasher_busy(e)
+
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid username or password")
 
-    token = create_access_token({"sub": user["username"]})
+    # Transparently upgrade hashes made with an older cost factor while we have the plain password
+    if password_hasher.needs_rehash(user["hashed_password"]):
+        try:
+            await aupdate_password_hash(user["id"], await password_hasher.hash(user_data.password))
+        except PasswordHasherBusy:
+            pass  # try again on a later login
+
+    token = create_access_token({"sub": user["username"], "role": user["role"]})
     return {
         "access_token": token,
         "token_type": "bearer"
     }
 
+@app.get("/me")
+async def me(user=Depends(get_current_user)):
+    # Served from the verified-token cache: no signature check on repeat calls and no DB query
+    return {"username": user["username"], "role": user["role"]}
+
+@app.get("/metrics/password_hasher")
+def password_hasher_metrics():
+    return password_hasher.metrics()
+
+@app.get("/metrics/prediction_cache")
+def prediction_cache_metrics():
+    return prediction_cache.metrics()
+
+@app.get("/metrics/prediction_writer")
+def prediction_writer_metrics():
+    return prediction_writer.metrics()
+
 @app.get("/predictions_with_sensitive_features")
 def get_predictions_with_sensitive_features():
     # TODO: Replace this with real DB query later
@@ -68,28 +154,130 @@ def get_shap_explanations():
     }
 
 from fastapi import Query
+from fast_json import dumps
+from db import DatabaseBusy
+from prediction_store import (
+    EXPORT_FORMATS, PAST_PREDICTIONS_MAX_LIMIT, decode_cursor, export_csv, export_parquet,
+    iter_past_predictions,
+)
 
-# Dummy player dataset for illustration
-players_db = {
-    "1": {"id": "1", "name": "Alice", "age": 25, "sport": "Soccer", "team": "A"},
-    "2": {"id": "2", "name": "Bob", "age": 26, "sport": "Soccer", "team": "A"},
-    "3": {"id": "3", "name": "Charlie", "age": 24, "sport": "Basketball", "team": "B"},
-    # Add more players or load real dataset
-}
+def prime_stream(chunks):
+    # Pulls the first chunk now, so checkout and query errors become an error status instead of
+    # a truncated body behind a 200 that has already been sent
+    try:
+        first = next(chunks)
+    except StopIteration:
+        return iter(())
+    except DatabaseBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Query failed: {e}")
+    return itertools.chain([first], chunks)
 
-@app.get("/player_similarity")
-def player_similarity(player_id: str = Query(..., description="Player ID to find similarities for")):
-    if player_id not in players_db:
+@app.get("/past-predictions")
+def past_predictions(
+    from_: Optional[datetime] = Query(None, alias="from", description="Inclusive lower bound on insertion_timestamp"),
+    to: Optional[datetime] = Query(None, description="Exclusive upper bound on insertion_timestamp"),
+    limit: int = Query(1000, ge=1, le=PAST_PREDICTIONS_MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    position: Optional[str] = None,
+    nationality: Optional[str] = None,
+):
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    rows = prime_stream(iter_past_predictions(limit, start=from_, end=to, position=position,
+                                              nationality=nationality, cursor=cursor))
+
+    def body():
+        # Streamed row by row: {"predictions": [...], "next_cursor": "..." | null}
+        yield b'{"predictions":['
+        separator = b""
+        for row, next_cursor in rows:
+            if row is None:
+                yield b'],"next_cursor":' + dumps(next_cursor) + b"}"
+                return
+            yield separator + dumps(row)
+            separator = b","
+
+    return StreamingResponse(body(), media_type="application/json")
+
+@app.get("/past-predictions/export")
+def export_past_predictions(
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    position: Optional[str] = None,
+    nationality: Optional[str] = None,
+):
+    # Streams the whole filtered history from a server-side cursor, chunk by chunk
+    exporter = export_parquet if format == "parquet" else export_csv
+    body = prime_stream(exporter(start=from_, end=to, position=position, nationality=nationality))
+    headers = {"Content-Disposition": f'attachment; filename="past_predictions.{format}"'}
+    return StreamingResponse(body, media_type=EXPORT_FORMATS[format], headers=headers)
+
+from similarity import (
+    get_player_index, load_player_index, upsert_players, delete_players,
+    start_compactor, stop_compactor,
+)
+
+@app.on_event("startup")
+def build_player_index():
+    # Memory-maps the last compacted snapshot if there is one, otherwise builds from the CSVs
+    load_player_index()
+    start_compactor()
+
+@app.on_event("shutdown")
+def stop_player_index_compactor():
+    stop_compactor()
+
+class PlayerIndexUpdate(BaseModel):
+    players: List[Dict] = []  # scored players: player_id, FIFA features and predicted_overall
+    deleted_player_ids: List[str] = []
+
+@app.post("/similar_players/index")
+def update_player_index(payload: PlayerIndexUpdate, caller=Depends(role_required(["admin", "service"]))):
+    # Incremental maintenance fed by the prediction DAG; the background compactor
+    # drops tombstones and refreshes the snapshot later
+    if any("player_id" not in p for p in payload.players):
+        raise HTTPException(status_code=400, detail="Every player needs a player_id")
+    upserted = upsert_players(pd.DataFrame(payload.players)) if payload.players else 0
+    deleted = delete_players(payload.deleted_player_ids)
+    return {"upserted": upserted, "deleted": deleted, "indexed_players": len(get_player_index())}
+
+def find_similar_players(player_id: str, top_n: int):
+    # Cosine top-k over the normalized player embedding matrix (IVF-accelerated for large catalogs)
+    similar_players = get_player_index().search(player_id, top_n)
+    if similar_players is None:
         raise HTTPException(status_code=404, detail="Player not found")
+    return similar_players
 
-    # Dummy similarity logic: return players from the same sport and different id
-    player = players_db[player_id]
-    similar_players = [
-        p for pid, p in players_db.items() 
-        if pid != player_id and p["sport"] == player["sport"]
-    ]
+@app.get("/player_similarity")
+def player_similarity(player_id: str = Query(..., description="Player ID to find similarities for"),
+                      top_n: int = Query(10, ge=1, le=100)):
+    return {"player_id": player_id, "similar_players": find_similar_players(player_id, top_n)}
+
+@app.get("/similar_players")
+def similar_players(reference_player_id: str = Query(..., description="Player ID to find similarities for"),
+                    top_n: int = Query(5, ge=1, le=100),
+                    format: str = Query("json", pattern="^(json|csv)$")):
+    similar = find_similar_players(reference_player_id, top_n)
+    if format == "json":
+        return similar
 
-    return {"player_id": player_id, "similar_players": similar_players}
+    # CSV download link for the Streamlit page, so it never builds the file itself
+    def body():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=["player_id", "main_position", "nationality", "overall", "similarity_score"])
+        writer.writeheader()
+        writer.writerows(similar)
+        yield buffer.getvalue().encode("utf-8")
+
+    headers = {"Content-Disposition": 'attachment; filename="similar_players.csv"'}
+    return StreamingResponse(body(), media_type="text/csv", headers=headers)
 
 @app.get("/fairness_metrics")
 def fairness_metrics():
@@ -101,21 +289,189 @@ def fairness_metrics():
         "disparate_impact": 0.85
     }
 
-from typing import List, Dict
+from typing import List, Dict, Literal, Optional, Union
+import numpy as np
 from fastapi import Request
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from feature_schema import DEFAULT_MODEL, SCHEMA_VERSION
+from feature_validation import VALIDATORS
 
 class PredictionRequest(BaseModel):
     model: str
     data: List[Dict]  # List of athlete records
+    orient: Literal["columns", "rows"] = "columns"  # "rows" returns one dict per record
+    include_input: Optional[bool] = None  # echo the inputs back (defaults to True only for "rows")
 
-from model_runner import predict_from_model
+class FeaturePredictionRequest(BaseModel):
+    # FIFA player records; each row is validated against the schema version and rejected on its own
+    schema_version: Literal[tuple(VALIDATORS)] = SCHEMA_VERSION
+    model: str = DEFAULT_MODEL
+    features: List[Dict]
+
+PREDICT_REQUEST = TypeAdapter(Union[FeaturePredictionRequest, PredictionRequest])
+
+from model_runner import InvalidInput, build_overall_columns, build_overall_response, format_predictions
+from fast_json import fast_json_response
+from arrow_codec import ARROW_STREAM, accepts_arrow, arrow_response, read_arrow_columns
+from model_registry import ModelUnavailable, UnknownModel, registry
+from inference_scheduler import scheduler
+from batch_jobs import batch_jobs
+from prediction_cache import feature_hashes, prediction_cache
+from prediction_writer import prediction_writer
+
+@app.on_event("startup")
+def load_models():
+    # Load, warm up and start watching every model once per process instead of per request
+    registry.add_reload_listener(prediction_cache.invalidate)
+    registry.load_all()
+    registry.start_watcher()
+    prediction_writer.start()
+    batch_jobs.load_all()
+    batch_jobs.start_janitor()
+
+@app.on_event("shutdown")
+async def stop_model_watcher():
+    await scheduler.close()
+    registry.stop_watcher()
+    batch_jobs.shutdown()
+    password_hasher.shutdown()
+    prediction_writer.stop()
+    close_pool()
+
+def inference_error(e: Exception):
+    # Only errors the caller can fix are 4xx; missing artifacts and model crashes are server-side,
+    # so clients such as the prediction DAG retry them instead of failing the file for good
+    if isinstance(e, (UnknownModel, InvalidInput)):
+        return HTTPException(status_code=400, detail=str(e))
+    if isinstance(e, ModelUnavailable):
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    return HTTPException(status_code=500, detail=f"Inference failed: {e}")
+
+async def score_features(schema_version: str, model: str, columns: Dict, n_rows: int, records: List[Dict] = None):
+    # Only rows that pass the schema reach the model; the rest come back with their indexes and errors
+    validator = VALIDATORS[schema_version]
+    matrix = validator.numeric_matrix(columns, n_rows)
+    valid, errors = validator.validate(columns, n_rows, matrix)
+    try:
+        # Rows already scored by this model version are served from the cache without inference
+        entry = registry.get(model)
+        valid_rows = np.flatnonzero(valid)
+        keys = feature_hashes(validator, columns, matrix[0], valid_rows)
+        y_pred, hit = await prediction_cache.aget_many(entry.name, entry.version, keys)
+        miss = np.flatnonzero(~hit)
+        if len(miss):
+            rows = valid_rows[miss]
+            if records is not None:
+                computed = await scheduler.predict(model, [records[i] for i in rows.tolist()])
+            else:
+                miss_columns = {col: np.asarray(values)[rows] for col, values in columns.items()}
+                computed = await scheduler.predict_columns(model, miss_columns, len(rows))
+            y_pred[miss] = computed
+            await prediction_cache.aput_many(entry.name, entry.version, [keys[i] for i in miss], computed)
+    except Exception as e:
+        raise inference_error(e)
+    # Persisted in the background by the COPY writer; the response does not wait for it
+    prediction_writer.enqueue(entry.name, entry.version, columns, valid_rows, y_pred)
+    return valid, y_pred, errors
+
+async def predict_arrow(request: Request, model: Optional[str], schema_version: Optional[str]):
+    # Arrow IPC body: decoded column-wise straight into the model's input matrix
+    try:
+        columns, n_rows = read_arrow_columns(await request.body())
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid Arrow payload: {e}")
+    if schema_version is not None:
+        return await score_features(schema_version, model or DEFAULT_MODEL, columns, n_rows)
+    try:
+        y_pred_proba = await scheduler.predict_columns(model or "Baseline", columns, n_rows)
+    except Exception as e:
+        raise inference_error(e)
+    return format_predictions([None] * n_rows, y_pred_proba, "columns", False)
 
 @app.post("/predict")
-async def predict(payload: PredictionRequest):
-    predictions = predict_from_model(payload.data, payload.model)
+async def predict(request: Request, model: Optional[str] = Query(None), schema_version: Optional[str] = Query(None)):
+    # Content negotiation: bulk clients send/accept Arrow IPC streams (model and schema_version in the
+    # query string), everyone else sends JSON: {"schema_version", "model", "features"} for the FIFA
+    # feature set or the athlete PredictionRequest {"model", "data"}
+    arrow_out = accepts_arrow(request.headers.get("accept"))
+    if schema_version is not None and schema_version not in VALIDATORS:
+        raise HTTPException(status_code=422, detail=f"Unknown schema_version: {schema_version}")
+
+    if request.headers.get("content-type", "").startswith(ARROW_STREAM):
+        result = await predict_arrow(request, model, schema_version)
+    else:
+        try:
+            payload = PREDICT_REQUEST.validate_json(await request.body())
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+
+        if isinstance(payload, FeaturePredictionRequest):
+            validator = VALIDATORS[payload.schema_version]
+            columns = validator.columns_from_records(payload.features)
+            columns["player_id"] = [record.get("player_id") for record in payload.features]
+            result = await score_features(payload.schema_version, payload.model, columns, len(payload.features), payload.features)
+        else:
+            # Inference runs on the scheduler's worker thread, batched with concurrent requests,
+            # so the event loop stays free for /login and the other endpoints
+            try:
+                y_pred_proba = await scheduler.predict(payload.model, payload.data)
+            except Exception as e:
+                raise inference_error(e)
+            result = format_predictions(payload.data, y_pred_proba, payload.orient, payload.include_input)
+
+    if isinstance(result, tuple):
+        if arrow_out:
+            return arrow_response(build_overall_columns(*result))
+        return fast_json_response(build_overall_response(*result))
+    if arrow_out and isinstance(result, dict):
+        return arrow_response({col: values for col, values in result.items() if col != "input"})
+    return fast_json_response({"predictions": result})
+
+class BatchJobCreate(BaseModel):
+    model: str = "Baseline"
+    schema_version: Optional[Literal[tuple(VALIDATORS)]] = None
+
+def get_batch_job(job_id: str):
+    job = batch_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# Batch prediction jobs: create a job, upload the CSV in (resumable) chunks, start it,
+# then poll its progress and download the results once it is done
+@app.post("/predict/jobs")
+def create_batch_job(payload: BatchJobCreate):
+    # Checked before any upload: an unknown model would otherwise only fail once the job starts
+    if not registry.known(payload.model):
+        raise HTTPException(status_code=400, detail=f"Unknown model: {payload.model}")
+    return batch_jobs.create(payload.model, payload.schema_version).to_dict()
+
+@app.put("/predict/jobs/{job_id}/upload")
+async def upload_batch_job_chunk(job_id: str, request: Request, offset: int = Query(..., ge=0)):
+    job = get_batch_job(job_id)
+    data = await request.body()
+    try:
+        uploaded = await asyncio.to_thread(batch_jobs.append_chunk, job, offset, data)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail={"error": str(e), "uploaded_bytes": job.uploaded_bytes})
+    return {"job_id": job_id, "uploaded_bytes": uploaded}
+
+@app.post("/predict/jobs/{job_id}/start")
+def start_batch_job(job_id: str):
+    job = get_batch_job(job_id)
+    try:
+        batch_jobs.start(job)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return job.to_dict()
 
-    if any("error" in p for p in predictions):
-        raise HTTPException(status_code=400, detail=predictions[0]["error"])
+@app.get("/predict/jobs/{job_id}")
+def batch_job_status(job_id: str):
+    return get_batch_job(job_id).to_dict()
 
-    return {"predictions": predictions}
+@app.get("/predict/jobs/{job_id}/results")
+def batch_job_results(job_id: str):
+    job = get_batch_job(job_id)
+    if job.state != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job.state}")
+    return FileResponse(job.result_path, media_type="text/csv", filename="predictions.csv")
@@ -1,29 +1,86 @@
-from fastapi import Request, HTTPException
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Depends, Request, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
-import os
 
-SECRET_KEY = os.getenv("JWT_SECRET", "your-secret-key")
-ALGORITHM = "HS256"
+from auth_utils import SECRET_KEY, ALGORITHM
+
 security = HTTPBearer()
 
-async def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = security):
-    token = credentials.credentials
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        role: str = payload.get("role")
+# Verified tokens, keyed by their SHA-256 so raw tokens are never kept in memory
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+
+class TokenCache:
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str):
+        key = self.key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.time():
+                # Evicted at the token's own exp, so an expired token is never served from cache
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def put(self, token: str, user: dict, expires_at: float):
+        key = self.key(token)
+        with self._lock:
+            self._entries[key] = (user, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
 
-        if email is None or role is None:
-            raise HTTPException(status_code=401, detail="Invalid token payload")
 
-        request.state.user = {"email": email, "role": role}
-        return request.state.user
+token_cache = TokenCache()
+
+
+def verify_token(token: str) -> dict:
+    user = token_cache.get(token)
+    if user is not None:
+        return user
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
 
+    username: str = payload.get("sub")
+    role: str = payload.get("role")
+    expires_at = payload.get("exp")
+    if username is None or role is None or expires_at is None:
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+
+    # The role travels inside the signed token, so authorizing never needs a DB lookup
+    user = {"username": username, "role": role, "exp": expires_at}
+    token_cache.put(token, user, expires_at)
+    return user
+
+
+async def get_current_user(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
+    request.state.user = verify_token(credentials.credentials)
+    return request.state.user
+
+
 def role_required(allowed_roles: list):
-    async def wrapper(request: Request, credentials: HTTPAuthorizationCredentials = security):
+    async def wrapper(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
         user = await get_current_user(request, credentials)
         if user["role"] not in allowed_roles:
             raise HTTPException(status_code=403, detail="Access denied")
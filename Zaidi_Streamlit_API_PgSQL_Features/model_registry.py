@@ -0,0 +1,210 @@
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from preprocessing import FeaturePreprocessor, preprocessor_path
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent
+MODELLING_DIR = BASE_DIR.parent / "Desktop" / "Modelling task" / "Desktop" / "Modelling task" / "models"
+
+# Named models served by the API (the `model` field of PredictionRequest)
+MODEL_PATHS = {
+    "Baseline": Path(os.getenv("MODEL_PATH", BASE_DIR / "final_nn_model.h5")),
+    # Regressor for the FIFA feature set (schema "fifa-v1"), predicts `overall`
+    "fifa_overall": Path(os.getenv("FIFA_MODEL_PATH", BASE_DIR / "fifa_overall_model.joblib")),
+    "xgboost": MODELLING_DIR / "xgboost_model.pkl",
+    "random_forest": MODELLING_DIR / "model_random.joblib",
+    "logistic_regression": MODELLING_DIR / "logistic_regression_model.pkl",
+    "gnn": MODELLING_DIR / "gnn_model.pt",
+}
+
+# Names the Streamlit pages send; there is no separate fairness-aware artifact yet
+MODEL_ALIASES = {
+    "Baseline Model": "Baseline",
+    "Fairness-Aware Model": "Baseline",
+}
+
+# How to produce artifacts that are built in this repo rather than shipped with it
+MODEL_BUILD_COMMANDS = {
+    "fifa_overall": "python train_fifa_model.py <training_csv>",
+}
+
+# Seconds between checks of the model files for changes (0 disables hot reload)
+RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "10"))
+
+
+class ModelUnavailable(ValueError):
+    pass
+
+
+class UnknownModel(ValueError):
+    pass
+
+
+def _missing_model_message(name: str, path: Path) -> str:
+    message = f"Model file for {name} not found at {path}"
+    if name in MODEL_BUILD_COMMANDS:
+        message += f"; create it with `{MODEL_BUILD_COMMANDS[name]}`"
+    return message
+
+
+@dataclass(frozen=True)
+class ModelEntry:
+    name: str
+    path: Path
+    model: Any
+    preprocessor: Optional[FeaturePreprocessor]
+    version: int  # mtime of the model file
+
+
+def _load_artifact(path: Path):
+    suffix = path.suffix.lower()
+    if suffix in (".h5", ".keras"):
+        from tensorflow.keras.models import load_model
+        return load_model(path)
+    if suffix in (".pkl", ".joblib"):
+        import joblib
+        return joblib.load(path)
+    if suffix == ".pt":
+        import torch
+        return torch.load(path, map_location="cpu")
+    raise ValueError(f"Unsupported model format: {path.name}")
+
+
+def _load_preprocessor(model_path: Path) -> Optional[FeaturePreprocessor]:
+    path = preprocessor_path(model_path)
+    return FeaturePreprocessor.load(path) if path.exists() else None
+
+
+def _input_width(model) -> Optional[int]:
+    if hasattr(model, "n_features_in_"):
+        return int(model.n_features_in_)
+    input_shape = getattr(model, "input_shape", None)
+    if input_shape is not None and input_shape[-1] is not None:
+        return int(input_shape[-1])
+    return None
+
+
+def _warm_up(entry: ModelEntry):
+    # The first predict call builds graphs / allocates buffers; pay that cost before serving
+    predict = getattr(entry.model, "predict", None)
+    width = entry.preprocessor.width if entry.preprocessor is not None else _input_width(entry.model)
+    if predict is None or width is None:
+        return
+    try:
+        predict(np.zeros((1, width), dtype=np.float32))
+    except Exception as e:
+        logger.warning("Warm-up for model %s failed: %s", entry.name, e)
+
+
+class ModelRegistry:
+    def __init__(self, model_paths: Dict[str, Path], aliases: Dict[str, str] = None):
+        self._paths = dict(model_paths)
+        self._aliases = dict(aliases or {})
+        self._entries: Dict[str, ModelEntry] = {}
+        self._load_lock = threading.RLock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._reload_listeners: List[Callable[[str, int], None]] = []
+
+    def add_reload_listener(self, callback: Callable[[str, int], None]):
+        # Called with (name, version) every time a model version is swapped in
+        self._reload_listeners.append(callback)
+
+    def resolve(self, name: str) -> str:
+        return self._aliases.get(name, name)
+
+    def known(self, name: str) -> bool:
+        return self.resolve(name) in self._paths
+
+    def load(self, name: str) -> ModelEntry:
+        path = self._paths[name]
+        with self._load_lock:
+            version = path.stat().st_mtime_ns
+            entry = ModelEntry(
+                name=name,
+                path=path,
+                model=_load_artifact(path),
+                preprocessor=_load_preprocessor(path),
+                version=version,
+            )
+            _warm_up(entry)
+            # Readers keep whatever entry they fetched, so replacing the dict value swaps versions atomically
+            self._entries[name] = entry
+        logger.info("Loaded model %s (version %s)", name, version)
+        for callback in self._reload_listeners:
+            try:
+                callback(name, version)
+            except Exception as e:
+                logger.error("Reload listener for model %s failed: %s", name, e)
+        return entry
+
+    def load_all(self):
+        for name, path in self._paths.items():
+            if not path.exists():
+                # Models the API's own endpoints default to are an error, not just a skip
+                log = logger.error if name in MODEL_BUILD_COMMANDS else logger.warning
+                log("%s, skipping", _missing_model_message(name, path))
+                continue
+            try:
+                self.load(name)
+            except Exception as e:
+                logger.error("Failed to load model %s: %s", name, e)
+
+    def get(self, name: str) -> ModelEntry:
+        name = self.resolve(name)
+        entry = self._entries.get(name)
+        if entry is not None:
+            return entry
+        if name not in self._paths:
+            raise UnknownModel(f"Unknown model: {name}")
+        if not self._paths[name].exists():
+            raise ModelUnavailable(_missing_model_message(name, self._paths[name]))
+        # Not loaded at startup (e.g. file appeared later); load it once even under concurrent requests
+        with self._load_lock:
+            entry = self._entries.get(name)
+            return entry if entry is not None else self.load(name)
+
+    def reload_changed(self):
+        # Keyed on the model file only: writers replace the preprocessor first and the model last,
+        # so a new preprocessor is never paired with the old model
+        for name, path in self._paths.items():
+            try:
+                mtime = path.stat().st_mtime_ns
+            except FileNotFoundError:
+                continue
+            current = self._entries.get(name)
+            if current is not None and current.version == mtime:
+                continue
+            try:
+                self.load(name)
+            except Exception as e:
+                # Keep serving the previous version if the new file is half-written or broken
+                logger.error("Reload of model %s failed: %s", name, e)
+
+    def _watch(self):
+        while not self._stop.wait(RELOAD_INTERVAL):
+            self.reload_changed()
+
+    def start_watcher(self):
+        if RELOAD_INTERVAL <= 0 or self._watcher is not None:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="model-reloader", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+
+registry = ModelRegistry(MODEL_PATHS, MODEL_ALIASES)
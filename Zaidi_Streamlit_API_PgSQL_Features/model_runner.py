@@ -1,51 +1,89 @@
-import pandas as pd
 import numpy as np
-from tensorflow.keras.models import load_model
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.compose import ColumnTransformer
 
-# Define preprocessing
-categorical_features = ["Team", "Sport", "Season"]
-numerical_features = ["Age", "Height", "Weight", "Year"]
+from model_registry import ModelUnavailable, registry
 
-preprocessor = ColumnTransformer(transformers=[
-    ("num", StandardScaler(), numerical_features),
-    ("cat", OneHotEncoder(handle_unknown="ignore"), categorical_features)
-])
+class InvalidInput(ValueError):
+    pass
 
-# Path to your saved model
-MODEL_PATH = "final_nn_model.h5"
+def fitted_preprocessor(entry):
+    # A missing preprocessor is a deployment problem on our side, like a missing model file
+    if entry.preprocessor is None:
+        raise ModelUnavailable(f"No fitted preprocessor found for model {entry.name}; run preprocessing.py to create one")
+    return entry.preprocessor
 
-def preprocess_input(df: pd.DataFrame):
-    df = df.copy()
+def preprocess_input(entry, records: list):
+    preprocessor = fitted_preprocessor(entry)
+    try:
+        return preprocessor.transform_records(records)
+    except (TypeError, ValueError) as e:
+        raise InvalidInput(f"Invalid input records: {e}") from e
+
+def build_columnar_response(records: list, y_pred_proba: np.ndarray, include_input: bool = False):
+    predictions = {
+        "index": np.arange(len(records)),
+        "predicted_potential": np.where(y_pred_proba > 0.5, "High", "Low").tolist(),
+        "probability": y_pred_proba,
+    }
+    if include_input:
+        columns = dict.fromkeys(col for record in records for col in record)
+        predictions["input"] = {col: [record.get(col) for record in records] for col in columns}
+    return predictions
+
+def build_row_response(records: list, y_pred_proba: np.ndarray, include_input: bool = True):
+    labels = np.where(y_pred_proba > 0.5, "High", "Low").tolist()
+    probabilities = y_pred_proba.tolist()
+    predictions = [
+        {"index": i, "predicted_potential": label, "probability": proba}
+        for i, (label, proba) in enumerate(zip(labels, probabilities))
+    ]
+    if include_input:
+        for prediction, record in zip(predictions, records):
+            prediction["input"] = record
+    return predictions
+
+def format_predictions(records: list, y_pred_proba: np.ndarray, orient: str = "columns", include_input: bool = None):
+    # Column-oriented responses are the default; orient="rows" keeps the original per-row shape
+    if include_input is None:
+        include_input = orient == "rows"
+    build_response = build_row_response if orient == "rows" else build_columnar_response
+    return build_response(records, y_pred_proba, include_input)
 
-    # Example preprocessing: adjust this based on your model
-    if "Sex" in df.columns:
-        df["Sex"] = df["Sex"].map({"M": 1, "F": 0})
+def build_overall_response(valid: np.ndarray, y_pred: np.ndarray, errors: dict):
+    # Scored rows and rejected rows keep the index they had in the request
+    valid_index = np.flatnonzero(valid).tolist()
+    return {
+        "predictions": [
+            {"index": i, "predicted_overall": value}
+            for i, value in zip(valid_index, y_pred.tolist())
+        ],
+        "rejected": [{"index": i, "errors": errors[i]} for i in sorted(errors)],
+    }
 
-    df = df[numerical_features + categorical_features + ["Sex"]]
-    return preprocessor.fit_transform(df)  # Fit-transform for demonstration
+def build_overall_columns(valid: np.ndarray, y_pred: np.ndarray, errors: dict):
+    # Columnar (Arrow) shape: one entry per request row, null prediction / error where not applicable
+    n_rows = len(valid)
+    predicted = np.full(n_rows, np.nan, dtype=np.float32)
+    predicted[valid] = y_pred
+    return {
+        "index": np.arange(n_rows),
+        "predicted_overall": [None if not ok else value for ok, value in zip(valid.tolist(), predicted.tolist())],
+        "error": ["; ".join(errors[i]) if i in errors else None for i in range(n_rows)],
+    }
 
-def predict_from_model(records: list, model_name: str = "Baseline"):
-    df = pd.DataFrame(records)
-    if df.empty:
-        return []
+def run_inference(records: list, model_name: str = "Baseline") -> np.ndarray:
+    if not records:
+        return np.empty(0, dtype=np.float32)
+    entry = registry.get(model_name)
+    X_processed = preprocess_input(entry, records)
+    return np.asarray(entry.model.predict(X_processed), dtype=np.float32).reshape(len(records), -1)[:, 0]
 
+def run_inference_columns(columns: dict, n_rows: int, model_name: str = "Baseline") -> np.ndarray:
+    if n_rows == 0:
+        return np.empty(0, dtype=np.float32)
+    entry = registry.get(model_name)
+    preprocessor = fitted_preprocessor(entry)
     try:
-        X_processed = preprocess_input(df)
-        model = load_model(MODEL_PATH)
-        y_pred_proba = model.predict(X_processed)
-        y_pred_label = (y_pred_proba > 0.5).astype(int)
-
-        predictions = []
-        for i, row in df.iterrows():
-            predictions.append({
-                "index": i,
-                "input": row.to_dict(),
-                "predicted_potential": "High" if y_pred_label[i][0] == 1 else "Low",
-                "probability": float(y_pred_proba[i][0])
-            })
-
-        return predictions
-    except Exception as e:
-        return [{"error": str(e)}]
+        X_processed = preprocessor.transform_columns(columns, n_rows)
+    except (TypeError, ValueError) as e:
+        raise InvalidInput(f"Invalid input columns: {e}") from e
+    return np.asarray(entry.model.predict(X_processed), dtype=np.float32).reshape(n_rows, -1)[:, 0]
@@ -1,7 +1,12 @@
+import io
+import time
+
 import streamlit as st
 import pandas as pd
 import requests
 
+from batch_job_client import upload_in_chunks
+
 API_URL = "http://localhost:8000"  # Adjust if hosted differently
 
 st.title("🏋️‍♂️ Upload Athlete Dataset & Predict Potential")
@@ -33,17 +38,27 @@ if uploaded_file:
 
     if st.button("🚀 Run Prediction"):
         try:
-            with st.spinner("Calling prediction API..."):
-                payload = {"model": model_choice, "data": df.to_dict(orient="records")}
-                response = requests.post(f"{API_URL}/predict", json=payload)
-
-                if response.status_code == 200:
-                    pred_df = pd.DataFrame(response.json()["predictions"])
-                    st.success("✅ Predictions generated!")
-                    st.subheader("📈 Model Predictions")
-                    st.dataframe(pred_df)
-                else:
-                    st.error(f"❌ API Error: {response.status_code} - {response.json().get('detail')}")
+            # Batch job: upload the raw file in chunks, then poll while the server scores it chunk by chunk
+            job = requests.post(f"{API_URL}/predict/jobs", json={"model": model_choice}).json()
+            with st.spinner("Uploading file..."):
+                upload_in_chunks(f"{API_URL}/predict/jobs", job["job_id"], uploaded_file)
+            requests.post(f"{API_URL}/predict/jobs/{job['job_id']}/start").raise_for_status()
+
+            progress = st.progress(0.0, text="Scoring...")
+            while job["state"] not in ("done", "failed"):
+                time.sleep(1)
+                job = requests.get(f"{API_URL}/predict/jobs/{job['job_id']}").json()
+                progress.progress(min(job["rows_processed"] / max(len(df), 1), 1.0),
+                                  text=f"Scored {job['rows_processed']} of {len(df)} rows")
+
+            if job["state"] == "done":
+                response = requests.get(f"{API_URL}/predict/jobs/{job['job_id']}/results")
+                pred_df = pd.read_csv(io.StringIO(response.text))
+                st.success("✅ Predictions generated!")
+                st.subheader("📈 Model Predictions")
+                st.dataframe(pred_df)
+            else:
+                st.error(f"❌ Prediction job failed: {job['error']}")
         except Exception as e:
             st.error(f"⚠️ Request failed: {e}")
 else:
@@ -0,0 +1,115 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import bcrypt
+
+# bcrypt cost factor for new hashes; existing hashes with another cost are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+# Hash jobs allowed to wait or run at once; beyond this, requests are turned away instead of queued
+HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(HASH_WORKERS * 4)))
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+def _hash(password: str, rounds: int):
+    start = time.perf_counter()
+    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+    return hashed, time.perf_counter() - start
+
+
+def _check(password: str, hashed: str):
+    start = time.perf_counter()
+    try:
+        ok = bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    except ValueError:
+        ok = False  # malformed stored hash: nothing can match it
+    return ok, time.perf_counter() - start
+
+
+def hash_rounds(hashed: str) -> int:
+    # bcrypt hashes look like $2b$12$<salt+hash>
+    return int(hashed.split("$")[2])
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING, rounds: int = BCRYPT_ROUNDS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_time = 0.0
+        self._max_time = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Separate processes, so ~250 ms bcrypt calls never compete with the API worker for the GIL.
+        # Spawned rather than forked: by the first login the API already runs the model reloader,
+        # prediction writer and other threads, and a forked child can inherit a lock one of them holds
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                    )
+        return self._executor
+
+    async def _submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise PasswordHasherBusy("Too many login attempts in progress, try again shortly")
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, elapsed = await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+        with self._lock:
+            self._completed += 1
+            self._total_time += elapsed
+            self._max_time = max(self._max_time, elapsed)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash, password, self.rounds)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._submit(_check, password, hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        try:
+            return hash_rounds(hashed) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "queue_depth": self._pending,
+                "max_pending": self.max_pending,
+                "workers": self.workers,
+                "rounds": self.rounds,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_hash_seconds": self._total_time / self._completed if self._completed else 0.0,
+                "max_hash_seconds": self._max_time,
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
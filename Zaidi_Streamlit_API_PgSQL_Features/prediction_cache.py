@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "100000"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "3600"))  # seconds
+# Optional second tier shared by every API worker (the prediction_cache table in Postgres)
+PREDICTION_CACHE_SHARED = os.getenv("PREDICTION_CACHE_SHARED", "0") == "1"
+
+
+def feature_hashes(validator, columns: dict, numeric: np.ndarray, rows: np.ndarray) -> List[str]:
+    # Canonical form: numeric features as float64 in schema order (so 85, 85.0 and "85" hash alike),
+    # then each category's position in its allowed list; column order in the request does not matter.
+    # `numeric` is the matrix validation already built and `rows` are valid rows only, so every
+    # category is a known one and a row is one fixed-width record hashed straight from the buffer
+    n_numeric = numeric.shape[1]
+    block = np.empty((len(rows), n_numeric + len(validator.categorical)), dtype=np.float64)
+    block[:, :n_numeric] = numeric[rows]
+    for j, (col, index) in enumerate(validator.category_index.items()):
+        block[:, n_numeric + j] = index.get_indexer(np.asarray(columns[col], dtype=object)[rows])
+    records = block.view(np.dtype((np.void, block.shape[1] * block.itemsize))).ravel()
+    return [hashlib.blake2b(record, digest_size=16).hexdigest() for record in records]
+
+
+class PredictionCache:
+    def __init__(self, max_entries: int = PREDICTION_CACHE_SIZE, ttl: float = PREDICTION_CACHE_TTL,
+                 shared: bool = PREDICTION_CACHE_SHARED):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        self._entries: OrderedDict = OrderedDict()  # (model, version, hash) -> (prediction, expires_at)
+        self._lock = threading.Lock()
+        self._stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def get_many(self, model: str, version: int, keys: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        # Cached predictions in key order and the mask of keys that were found; the mask, not the
+        # value, marks a hit, so a cached NaN prediction is still a hit
+        values = np.full(len(keys), np.nan)
+        hit = np.zeros(len(keys), dtype=bool)
+        now = time.monotonic()
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get((model, version, key))
+                if entry is None:
+                    continue
+                if entry[1] <= now:
+                    del self._entries[(model, version, key)]
+                    continue
+                self._entries.move_to_end((model, version, key))
+                values[i] = entry[0]
+                hit[i] = True
+            self._stats["local_hits"] += int(np.count_nonzero(hit))
+
+        missing = np.flatnonzero(~hit)
+        if self.shared and len(missing):
+            found = self._shared_get(model, version, [keys[i] for i in missing])
+            for i in missing:
+                if keys[i] in found:
+                    values[i] = found[keys[i]]
+                    hit[i] = True
+            self._store(model, version, [(key, value) for key, value in found.items()])
+            with self._lock:
+                self._stats["shared_hits"] += len(found)
+
+        with self._lock:
+            self._stats["misses"] += int(np.count_nonzero(~hit))
+        return values, hit
+
+    def put_many(self, model: str, version: int, keys: List[str], values: np.ndarray):
+        items = list(zip(keys, np.asarray(values, dtype=np.float64).tolist()))
+        self._store(model, version, items)
+        if self.shared and items:
+            self._shared_put(model, version, items)
+
+    def _store(self, model: str, version: int, items):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in items:
+                self._entries[(model, version, key)] = (value, expires_at)
+                self._entries.move_to_end((model, version, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, model: str, version: int = None):
+        # Called when a model (re)loads: predictions from any other version of it are dropped
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == model and key[1] != version]
+            for key in stale:
+                del self._entries[key]
+            self._stats["invalidations"] += len(stale)
+        if self.shared:
+            self._shared_invalidate(model, version)
+
+    def _shared_get(self, model: str, version: int, keys: List[str]) -> dict:
+        from db import get_cursor
+        try:
+            with get_cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT feature_hash, prediction FROM prediction_cache
+                    WHERE model = %s AND model_version = %s AND feature_hash = ANY(%s) AND expires_at > NOW()
+                    """,
+                    (model, version, keys),
+                )
+                return {row["feature_hash"]: row["prediction"] for row in cur.fetchall()}
+        except Exception as e:
+            # The shared tier is an optimisation; a database hiccup only costs a recomputation
+            logger.warning("Shared prediction cache lookup failed: %s", e)
+            return {}
+
+    def _shared_put(self, model: str, version: int, items):
+        from db import get_cursor
+        from psycopg2.extras import execute_values
+        try:
+            with get_cursor() as cur:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO prediction_cache (model, model_version, feature_hash, prediction, expires_at)
+                    VALUES %s
+                    ON CONFLICT (model, model_version, feature_hash)
+                    DO UPDATE SET prediction = EXCLUDED.prediction, expires_at = EXCLUDED.expires_at
+                    """,
+                    [(model, version, key, value, self.ttl) for key, value in items],
+                    template="(%s, %s, %s, %s, NOW() + %s * INTERVAL '1 second')",
+                )
+        except Exception as e:
+            logger.warning("Shared prediction cache write failed: %s", e)
+
+    def _shared_invalidate(self, model: str, version: int):
+        from db import get_cursor
+        try:
+            with get_cursor() as cur:
+                cur.execute(
+                    # Also sweeps expired rows of every model while we are at it
+                    "DELETE FROM prediction_cache WHERE (model = %s AND model_version IS DISTINCT FROM %s) OR expires_at <= NOW()",
+                    (model, version),
+                )
+        except Exception as e:
+            logger.warning("Shared prediction cache invalidation failed: %s", e)
+
+    async def aget_many(self, model: str, version: int, keys: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        # The shared tier does blocking I/O; keep it off the event loop
+        if self.shared:
+            return await asyncio.to_thread(self.get_many, model, version, keys)
+        return self.get_many(model, version, keys)
+
+    async def aput_many(self, model: str, version: int, keys: List[str], values: np.ndarray):
+        if self.shared:
+            return await asyncio.to_thread(self.put_many, model, version, keys, values)
+        return self.put_many(model, version, keys, values)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self._stats["local_hits"] + self._stats["shared_hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "shared": self.shared,
+                "hit_rate": (lookups - self._stats["misses"]) / lookups if lookups else 0.0,
+            }
+
+
+prediction_cache = PredictionCache()
@@ -0,0 +1,183 @@
+import base64
+import csv
+import io
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Optional
+
+from db import DatabaseBusy, dedicated_cursor, get_cursor
+from feature_schema import CATEGORICAL_COLUMNS, EXPECTED_COLUMNS, NUMERIC_COLUMNS
+
+PAST_PREDICTIONS_MAX_LIMIT = 5000
+FETCH_SIZE = 500
+# Exports open their own connection each; this caps how many Postgres serves at once
+EXPORT_MAX_CONCURRENT = int(os.getenv("PAST_PREDICTIONS_EXPORT_MAX_CONCURRENT", "2"))
+_export_slots = threading.BoundedSemaphore(EXPORT_MAX_CONCURRENT)
+
+
+def encode_cursor(row: dict) -> str:
+    raw = json.dumps([row["insertion_timestamp"].isoformat(), row["id"]])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def past_predictions_query(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                           position: Optional[str] = None, nationality: Optional[str] = None,
+                           cursor: Optional[str] = None):
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("insertion_timestamp >= %s")
+        params.append(start)
+    if end is not None:
+        clauses.append("insertion_timestamp < %s")
+        params.append(end)
+    if position:
+        clauses.append("main_position = %s")
+        params.append(position)
+    if nationality:
+        clauses.append("nationality = %s")
+        params.append(nationality)
+    if cursor:
+        # Keyset pagination: resume strictly after the last row of the previous page
+        clauses.append("(insertion_timestamp, id) > (%s, %s)")
+        params.extend(decode_cursor(cursor))
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    query = f"""
+        SELECT id, player_id, model, model_version, features, predicted_overall,
+               main_position, nationality, insertion_timestamp
+        FROM predictions
+        {where}
+        ORDER BY insertion_timestamp, id
+    """
+    return query, params
+
+
+def iter_past_predictions(limit: int, **filters):
+    # Yields up to `limit` (row, None) pairs, then one (None, next_cursor) pair;
+    # next_cursor is None on the last page
+    query, params = past_predictions_query(**filters)
+    # A page is at most PAST_PREDICTIONS_MAX_LIMIT + 1 rows, so it is fetched whole and the pooled
+    # connection goes back before the first row is sent; a slow reader never holds a pool slot
+    with get_cursor() as cur:
+        cur.execute(query + " LIMIT %s", params + [limit + 1])
+        rows = cur.fetchall()
+    for row in rows[:limit]:
+        yield row, None
+    # The extra row only tells us there is another page
+    yield None, encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+
+
+EXPORT_FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+# main_position is already one of the flattened feature columns
+EXPORT_METADATA_COLUMNS = [
+    "id", "player_id", "model", "model_version", "predicted_overall", "nationality", "insertion_timestamp",
+]
+EXPORT_COLUMNS = EXPORT_METADATA_COLUMNS + EXPECTED_COLUMNS
+
+
+def iter_prediction_batches(**filters):
+    # Server-side cursor: Postgres hands rows over FETCH_SIZE at a time, so memory stays flat
+    # however many rows match; exports may run longer than the usual statement timeout, so they
+    # use a dedicated connection rather than a pooled one
+    if not _export_slots.acquire(blocking=False):
+        raise DatabaseBusy(f"{EXPORT_MAX_CONCURRENT} exports already running, try again later")
+    try:
+        query, params = past_predictions_query(**filters)
+        with dedicated_cursor(name="predictions_export") as cur:
+            cur.itersize = FETCH_SIZE
+            cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                # Features are flattened into one column each, with a fixed schema (feature_schema)
+                yield [
+                    {**{col: row[col] for col in EXPORT_METADATA_COLUMNS},
+                     **{col: (row["features"] or {}).get(col) for col in EXPECTED_COLUMNS}}
+                    for row in rows
+                ]
+    finally:
+        _export_slots.release()
+
+
+def export_csv(**filters):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for batch in iter_prediction_batches(**filters):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    # Write-only file object for ParquetWriter: hands each written chunk to the response
+    # instead of keeping the file, while tell() still reports the true file offset
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _parquet_schema():
+    import pyarrow as pa
+
+    fields = [
+        pa.field("id", pa.int64()),
+        pa.field("player_id", pa.string()),
+        pa.field("model", pa.string()),
+        pa.field("model_version", pa.int64()),
+        pa.field("predicted_overall", pa.float64()),
+        pa.field("nationality", pa.string()),
+        pa.field("insertion_timestamp", pa.timestamp("us")),
+    ]
+    fields += [pa.field(col, pa.float64()) for col in NUMERIC_COLUMNS]
+    fields += [pa.field(col, pa.string()) for col in CATEGORICAL_COLUMNS]
+    return pa.schema(fields)
+
+
+def export_parquet(**filters):
+    # pyarrow is only needed for Parquet exports
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema()
+    sink = _ChunkSink()
+    # Each server-side batch becomes one row group, streamed out as soon as it is written
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for batch in iter_prediction_batches(**filters):
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            yield sink.drain()
+    yield sink.drain()
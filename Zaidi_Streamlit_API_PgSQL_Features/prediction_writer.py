@@ -0,0 +1,128 @@
+import csv
+import io
+import logging
+import os
+import threading
+from collections import deque
+from typing import Dict
+
+import numpy as np
+
+from fast_json import dumps
+
+logger = logging.getLogger(__name__)
+
+# Flush once this many rows are buffered or this many seconds passed, whichever comes first
+FLUSH_ROWS = int(os.getenv("PREDICTION_WRITER_FLUSH_ROWS", "5000"))
+FLUSH_INTERVAL = float(os.getenv("PREDICTION_WRITER_FLUSH_INTERVAL", "1.0"))
+# Rows held in memory at most; beyond this (e.g. database down) new predictions are dropped, not queued
+MAX_BUFFERED = int(os.getenv("PREDICTION_WRITER_MAX_BUFFERED", "200000"))
+
+COPY_SQL = """
+    COPY predictions (player_id, model, model_version, features, predicted_overall, main_position, nationality)
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+
+class PredictionWriter:
+    # Requests only append a reference to their columns; serialisation and COPY happen on the writer thread
+    def __init__(self, flush_rows: int = FLUSH_ROWS, flush_interval: float = FLUSH_INTERVAL, max_buffered: int = MAX_BUFFERED):
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self._batches = deque()
+        self._buffered = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {"written": 0, "dropped": 0, "flushes": 0, "failed_flushes": 0}
+
+    def enqueue(self, model: str, version: int, columns: Dict, rows: np.ndarray, predictions: np.ndarray):
+        if not len(rows):
+            return
+        with self._lock:
+            if self._buffered + len(rows) > self.max_buffered:
+                self._stats["dropped"] += len(rows)
+                return
+            self._batches.append((model, version, columns, rows, predictions))
+            self._buffered += len(rows)
+            if self._buffered >= self.flush_rows:
+                self._wake.set()
+
+    def _to_csv(self, batches) -> io.StringIO:
+        from feature_schema import EXPECTED_COLUMNS
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for model, version, columns, rows, predictions in batches:
+            features = {col: columns[col] for col in EXPECTED_COLUMNS if col in columns}
+            player_ids = columns.get("player_id")
+            for row, prediction in zip(rows.tolist(), np.asarray(predictions).tolist()):
+                record = {col: values[row] for col, values in features.items()}
+                writer.writerow([
+                    player_ids[row] if player_ids is not None else None,
+                    model,
+                    version,
+                    dumps(record).decode("utf-8"),
+                    prediction,
+                    record.get("main_position"),
+                    record.get("nationality_grouped"),
+                ])
+        buffer.seek(0)
+        return buffer
+
+    def flush(self):
+        with self._lock:
+            batches = list(self._batches)
+            rows = self._buffered
+            self._batches.clear()
+            self._buffered = 0
+        if not batches:
+            return
+        from db import get_cursor
+        try:
+            with get_cursor() as cur:
+                cur.copy_expert(COPY_SQL, self._to_csv(batches))
+        except Exception as e:
+            logger.error("Writing %s predictions failed: %s", rows, e)
+            with self._lock:
+                self._stats["failed_flushes"] += 1
+                # Put the rows back in front for the next flush, as long as they still fit
+                if self._buffered + rows <= self.max_buffered:
+                    self._batches.extendleft(reversed(batches))
+                    self._buffered += rows
+                else:
+                    self._stats["dropped"] += rows
+            return
+        with self._lock:
+            self._stats["written"] += rows
+            self._stats["flushes"] += 1
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="prediction-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # Final flush so predictions made just before shutdown still reach the table
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {**self._stats, "buffered": self._buffered, "max_buffered": self.max_buffered}
+
+
+prediction_writer = PredictionWriter()
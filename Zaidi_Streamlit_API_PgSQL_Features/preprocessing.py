@@ -0,0 +1,110 @@
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Define preprocessing
+categorical_features = ["Team", "Sport", "Season"]
+numerical_features = ["Age", "Height", "Weight", "Year"]
+
+
+def preprocessor_path(model_path: Path) -> Path:
+    # The fitted preprocessing artifact lives next to the model it was trained with
+    return Path(model_path).with_suffix(".preprocessor.json")
+
+
+# Fit-once equivalent of the StandardScaler + OneHotEncoder ColumnTransformer.
+# Output columns keep the layout the models were trained on: scaled numerical features
+# first, then one one-hot block per categorical feature (sorted categories, unknown -> all zeros).
+class FeaturePreprocessor:
+    def __init__(self, numerical: List[str], categorical: List[str],
+                 means: List[float], scales: List[float], categories: Dict[str, List]):
+        self.numerical = list(numerical)
+        self.categorical = list(categorical)
+        self.means = np.asarray(means, dtype=np.float32)
+        self.scales = np.asarray(scales, dtype=np.float32)
+        self.categories = {col: list(categories[col]) for col in self.categorical}
+
+        # Precomputed category -> output column index maps for the one-hot block
+        self.column_index = {}
+        offset = len(self.numerical)
+        for col in self.categorical:
+            self.column_index[col] = {value: offset + i for i, value in enumerate(self.categories[col])}
+            offset += len(self.categories[col])
+        self.width = offset
+
+    @classmethod
+    def fit(cls, df: pd.DataFrame, numerical=None, categorical=None):
+        numerical = list(numerical or numerical_features)
+        categorical = list(categorical or categorical_features)
+        values = df[numerical].to_numpy(dtype=np.float64)
+        means = np.nanmean(values, axis=0)
+        scales = np.nanstd(values, axis=0)
+        scales[scales == 0] = 1.0  # same guard StandardScaler uses for constant columns
+        categories = {col: sorted(df[col].dropna().unique().tolist()) for col in categorical}
+        return cls(numerical, categorical, means.tolist(), scales.tolist(), categories)
+
+    def to_dict(self):
+        return {
+            "numerical": self.numerical,
+            "categorical": self.categorical,
+            "means": self.means.tolist(),
+            "scales": self.scales.tolist(),
+            "categories": self.categories,
+        }
+
+    def save(self, path: Path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path: Path):
+        with open(path) as f:
+            return cls(**json.load(f))
+
+    def transform_columns(self, columns: Dict[str, np.ndarray], n_rows: int) -> np.ndarray:
+        # Columnar input (e.g. decoded Arrow buffers) goes straight into the model matrix
+        n_num = len(self.numerical)
+        X = np.zeros((n_rows, self.width), dtype=np.float32)
+
+        # Missing numerical columns/values become NaN, matching what a DataFrame would hold
+        for i, col in enumerate(self.numerical):
+            X[:, i] = np.asarray(columns[col], dtype=np.float32) if col in columns else np.nan
+        X[:, :n_num] -= self.means
+        X[:, :n_num] /= self.scales
+
+        for col in self.categorical:
+            if col not in columns:
+                continue
+            # Map each distinct value once, then scatter the ones into the one-hot block
+            codes, uniques = pd.factorize(np.asarray(columns[col], dtype=object))
+            index = self.column_index[col]
+            positions = np.array([index.get(value, -1) for value in uniques] + [-1], dtype=np.int64)[codes]
+            rows = np.flatnonzero(positions >= 0)
+            X[rows, positions[rows]] = 1.0
+        return X
+
+    def transform_records(self, records: List[Dict]) -> np.ndarray:
+        columns = {
+            col: [record.get(col) for record in records]
+            for col in self.numerical + self.categorical
+        }
+        return self.transform_columns(columns, len(records))
+
+    def transform(self, df: pd.DataFrame) -> np.ndarray:
+        return self.transform_records(df.to_dict(orient="records"))
+
+
+if __name__ == "__main__":
+    # Usage: python preprocessing.py <training_csv> <model_path> [fifa]
+    training_csv, model_path = sys.argv[1], sys.argv[2]
+    if sys.argv[3:] == ["fifa"]:
+        from feature_schema import CATEGORICAL_COLUMNS, NUMERIC_COLUMNS
+        fitted = FeaturePreprocessor.fit(pd.read_csv(training_csv), NUMERIC_COLUMNS, list(CATEGORICAL_COLUMNS))
+    else:
+        fitted = FeaturePreprocessor.fit(pd.read_csv(training_csv))
+    fitted.save(preprocessor_path(model_path))
+    print(f"Saved preprocessor for {model_path} ({fitted.width} features)")
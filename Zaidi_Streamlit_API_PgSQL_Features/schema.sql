@@ -0,0 +1,48 @@
+CREATE TABLE IF NOT EXISTS users (
+    id SERIAL PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE,
+    email TEXT NOT NULL UNIQUE,
+    full_name TEXT,
+    hashed_password TEXT NOT NULL,
+    role TEXT NOT NULL DEFAULT 'user',
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Existing databases created without the constraints registration now relies on
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = 'users'::regclass AND conname = 'users_username_key') THEN
+        ALTER TABLE users ADD CONSTRAINT users_username_key UNIQUE (username);
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = 'users'::regclass AND conname = 'users_email_key') THEN
+        ALTER TABLE users ADD CONSTRAINT users_email_key UNIQUE (email);
+    END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS predictions (
+    id BIGSERIAL PRIMARY KEY,
+    player_id TEXT,
+    model TEXT NOT NULL,
+    model_version BIGINT,
+    features JSONB NOT NULL,
+    predicted_overall DOUBLE PRECISION,
+    main_position TEXT,
+    nationality TEXT,
+    insertion_timestamp TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Keyset pagination walks (insertion_timestamp, id); the filtered variants keep their own order
+CREATE INDEX IF NOT EXISTS predictions_insertion_timestamp_idx ON predictions (insertion_timestamp, id);
+CREATE INDEX IF NOT EXISTS predictions_position_timestamp_idx ON predictions (main_position, insertion_timestamp, id);
+CREATE INDEX IF NOT EXISTS predictions_nationality_timestamp_idx ON predictions (nationality, insertion_timestamp, id);
+
+-- Optional shared tier of the prediction cache (PREDICTION_CACHE_SHARED=1)
+CREATE TABLE IF NOT EXISTS prediction_cache (
+    model TEXT NOT NULL,
+    model_version BIGINT NOT NULL,
+    feature_hash TEXT NOT NULL,
+    prediction DOUBLE PRECISION NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (model, model_version, feature_hash)
+);
+CREATE INDEX IF NOT EXISTS prediction_cache_expires_idx ON prediction_cache (expires_at);
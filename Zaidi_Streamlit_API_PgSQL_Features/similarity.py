@@ -0,0 +1,366 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from feature_schema import NUMERIC_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Scored players to index (CSV or Parquet files written by the prediction DAG; Parquet ones sit in
+# ingestion_date=YYYY-MM-DD subdirectories, hence the recursive glob)
+PLAYER_DATA_GLOB = os.getenv(
+    "PLAYER_DATA_GLOB",
+    os.path.join(os.path.dirname(__file__), "..", "airflow", "data", "predicted_data", "**", "predicted_*"),
+)
+PLAYER_FILE_READERS = {".csv": pd.read_csv, ".parquet": pd.read_parquet}
+# Compacted index snapshot, memory-mapped at startup instead of rebuilding from the CSVs
+SNAPSHOT_DIR = Path(os.getenv("SIMILARITY_SNAPSHOT_DIR", os.path.join(os.path.dirname(__file__), "similarity_index")))
+COMPACT_INTERVAL = float(os.getenv("SIMILARITY_COMPACT_INTERVAL", "300"))
+# Catalogs at least this large are searched through the IVF index instead of a full scan
+ANN_MIN_ROWS = int(os.getenv("SIMILARITY_ANN_MIN_ROWS", "50000"))
+ANN_PROBES = int(os.getenv("SIMILARITY_ANN_PROBES", "8"))
+
+METADATA_COLUMNS = {
+    "main_position": "main_position",
+    "nationality_grouped": "nationality",
+    "predicted_overall": "overall",
+}
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def _clean(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+class IVFIndex:
+    # Inverted-file index: spherical k-means buckets over the unit vectors; a query only
+    # scores the rows in the n_probe buckets whose centroids are closest to it
+    def __init__(self, vectors: np.ndarray, n_lists: int = None, iterations: int = 10,
+                 training_rows: int = 50000, seed: int = 0):
+        n = len(vectors)
+        self.n_lists = n_lists or max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        # Centroids are trained on a sample; every row is then assigned once
+        sample = vectors[rng.choice(n, min(n, training_rows), replace=False)]
+        self.centroids = sample[rng.choice(len(sample), self.n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignment = self.assign(sample)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, assignment, sample)
+            filled = np.bincount(assignment, minlength=self.n_lists) > 0  # empty buckets keep their previous centroid
+            norms = np.linalg.norm(sums[filled], axis=1, keepdims=True)
+            self.centroids[filled] = sums[filled] / np.maximum(norms, 1e-12)
+
+        self.lists = []
+        self.add(vectors, 0)
+
+    def _group(self, assignment: np.ndarray):
+        order = np.argsort(assignment, kind="stable")
+        return order, np.searchsorted(assignment[order], np.arange(self.n_lists + 1))
+
+    def assign(self, vectors: np.ndarray, chunk: int = 65536) -> np.ndarray:
+        if not len(vectors):
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([
+            np.argmax(vectors[i:i + chunk] @ self.centroids.T, axis=1)
+            for i in range(0, len(vectors), chunk)
+        ])
+
+    def add(self, vectors: np.ndarray, first_row: int):
+        # New rows go into their nearest existing bucket; centroids are only retrained on compaction
+        order, bounds = self._group(self.assign(vectors))
+        if not self.lists:
+            self.lists = [np.empty(0, dtype=np.int64) for _ in range(self.n_lists)]
+        for c in range(self.n_lists):
+            if bounds[c + 1] > bounds[c]:
+                self.lists[c] = np.concatenate([self.lists[c], first_row + order[bounds[c]:bounds[c + 1]]])
+
+    def candidates(self, query: np.ndarray, n_probe: int) -> np.ndarray:
+        probes = _top_k(self.centroids @ query, n_probe)
+        return np.concatenate([self.lists[c] for c in probes])
+
+
+class PlayerIndex:
+    def __init__(self, ids, vectors: np.ndarray, metadata: dict, means: np.ndarray, scales: np.ndarray,
+                 fitted: bool = True):
+        self.ids = [str(player_id) for player_id in ids]
+        self.size = len(self.ids)
+        # Rows [0, size) are valid; vectors may be a read-only memory map until the first append
+        self._vectors = vectors
+        self.alive = np.ones(self.size, dtype=bool)
+        self.metadata = {col: list(metadata.get(col, [None] * self.size)) for col in METADATA_COLUMNS.values()}
+        self.means = np.asarray(means, dtype=np.float32)
+        self.scales = np.asarray(scales, dtype=np.float32)
+        # An index built from zero rows has placeholder stats; the first upsert fits them
+        self.fitted = fitted
+        self.positions = {player_id: i for i, player_id in enumerate(self.ids)}
+        self.ivf = IVFIndex(self.vectors) if self.size >= ANN_MIN_ROWS else None
+        self.changes = 0  # appends + tombstones since the last snapshot
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:self.size]
+
+    @property
+    def tombstones(self) -> int:
+        return self.size - len(self.positions)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame):
+        ids = df["player_id"] if "player_id" in df.columns else np.arange(len(df))
+        values = df[NUMERIC_COLUMNS].to_numpy(dtype=np.float32)
+        if len(values):
+            means, scales = cls.fit_stats(values)
+        else:
+            means, scales = np.zeros(len(NUMERIC_COLUMNS), np.float32), np.ones(len(NUMERIC_COLUMNS), np.float32)
+        metadata = {name: df[col].tolist() for col, name in METADATA_COLUMNS.items() if col in df.columns}
+        vectors = np.ascontiguousarray(cls.embed(values, means, scales))
+        return cls(ids, vectors, metadata, means, scales, fitted=bool(len(values)))
+
+    @staticmethod
+    def fit_stats(values: np.ndarray):
+        means = np.nanmean(values, axis=0)
+        scales = np.nanstd(values, axis=0)
+        scales[scales == 0] = 1.0
+        return means, scales
+
+    @staticmethod
+    def embed(values: np.ndarray, means: np.ndarray, scales: np.ndarray) -> np.ndarray:
+        # Standardize each attribute, then L2-normalize so a dot product is the cosine similarity
+        vectors = np.nan_to_num((values - means) / scales).astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _reserve(self, extra: int):
+        capacity = len(self._vectors) if isinstance(self._vectors, np.ndarray) and self._vectors.flags.writeable else 0
+        if self.size + extra <= capacity:
+            return
+        # Amortized growth; in-flight searches keep reading the old buffer they already hold
+        grown = np.empty((max(2 * capacity, self.size + extra, 1024), len(NUMERIC_COLUMNS)), dtype=np.float32)
+        grown[:self.size] = self._vectors[:self.size]
+        alive = np.zeros(len(grown), dtype=bool)
+        alive[:self.size] = self.alive[:self.size]
+        self._vectors, self.alive = grown, alive
+
+    def upsert(self, df: pd.DataFrame) -> int:
+        # Append new or re-scored players; a re-sent player_id tombstones its previous row
+        ids = [str(player_id) for player_id in df["player_id"]]
+        values = df[NUMERIC_COLUMNS].to_numpy(dtype=np.float32)
+        if not self.fitted and len(values):
+            # Still empty (nothing was scored when the index was built), so nothing embedded
+            # with the placeholder stats has to be redone
+            self.means, self.scales = self.fit_stats(values)
+            self.fitted = True
+        vectors = self.embed(values, self.means, self.scales)
+        metadata = {name: df[col].tolist() if col in df.columns else [None] * len(df) for col, name in METADATA_COLUMNS.items()}
+
+        self._reserve(len(ids))
+        start = self.size
+        self._vectors[start:start + len(ids)] = vectors
+        self.alive[start:start + len(ids)] = True
+        self.ids.extend(ids)
+        for name, values in metadata.items():
+            self.metadata[name].extend(values)
+        if self.ivf is not None:
+            self.ivf.add(vectors, start)
+        # Rows are fully written before size covers them, and size covers them before any
+        # position points at them, so a lock-free search never reads past what is written
+        self.size += len(ids)
+        for offset, player_id in enumerate(ids):
+            previous = self.positions.get(player_id)
+            if previous is not None:
+                self.alive[previous] = False
+            self.positions[player_id] = start + offset
+        self.changes += len(ids)
+        return len(ids)
+
+    def delete(self, player_ids: Iterable[str]) -> int:
+        deleted = 0
+        for player_id in player_ids:
+            position = self.positions.pop(str(player_id), None)
+            if position is not None:
+                self.alive[position] = False
+                deleted += 1
+        self.changes += deleted
+        return deleted
+
+    def search(self, player_id: str, top_n: int = 5) -> Optional[List[dict]]:
+        position = self.positions.get(str(player_id))
+        if position is None:
+            return None
+        size, vectors, alive = self.size, self._vectors, self.alive
+        query = vectors[position]
+
+        if self.ivf is not None:
+            candidates = self.ivf.candidates(query, ANN_PROBES)
+            candidates = candidates[candidates < size]
+        else:
+            candidates = np.arange(size)
+        scores = vectors[candidates] @ query
+        scores[~alive[candidates]] = -np.inf  # tombstoned rows never come back
+
+        # Ask for one extra hit, since the reference player is always its own best match
+        top = _top_k(scores, top_n + 1)
+        results = []
+        for row, score in zip(candidates[top], scores[top]):
+            if row == position or not np.isfinite(score):
+                continue
+            results.append({
+                "player_id": self.ids[row],
+                **{name: _clean(values[row]) for name, values in self.metadata.items()},
+                "similarity_score": float(score),
+            })
+        return results[:top_n]
+
+    def compacted(self) -> "PlayerIndex":
+        # Rebuild without tombstoned rows, which also retrains the IVF buckets
+        rows = np.flatnonzero(self.alive[:self.size])
+        ids = [self.ids[row] for row in rows]
+        vectors = np.array(self._vectors[rows], dtype=np.float32)
+        metadata = {name: [values[row] for row in rows] for name, values in self.metadata.items()}
+        return PlayerIndex(ids, vectors, metadata, self.means, self.scales, self.fitted)
+
+    def save(self, directory: Path):
+        # Vectors go to a new file per snapshot; index.json is replaced last, atomically,
+        # so a reader always finds a manifest that points at a complete vectors file
+        directory.mkdir(parents=True, exist_ok=True)
+        vectors_name = f"vectors-{time.time_ns()}.npy"
+        np.save(directory / vectors_name, np.ascontiguousarray(self.vectors[self.alive[:self.size]]))
+        live = [row for row in range(self.size) if self.alive[row]]
+        manifest = {
+            "vectors": vectors_name,
+            "ids": [self.ids[row] for row in live],
+            "metadata": {name: [_clean(values[row]) for row in live] for name, values in self.metadata.items()},
+            "means": self.means.tolist(),
+            "scales": self.scales.tolist(),
+            "fitted": self.fitted,
+        }
+        tmp = directory / "index.json.tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, directory / "index.json")
+        for old in directory.glob("vectors-*.npy"):
+            if old.name != vectors_name:
+                old.unlink(missing_ok=True)
+
+    @classmethod
+    def load(cls, directory: Path):
+        with open(directory / "index.json") as f:
+            manifest = json.load(f)
+        vectors = np.load(directory / manifest["vectors"], mmap_mode="r")
+        return cls(manifest["ids"], vectors, manifest["metadata"], manifest["means"], manifest["scales"],
+                   manifest.get("fitted", bool(manifest["ids"])))
+
+
+def load_player_frame(pattern: str = PLAYER_DATA_GLOB) -> pd.DataFrame:
+    frames = []
+    for path in sorted(glob.glob(pattern, recursive=True)):
+        reader = PLAYER_FILE_READERS.get(Path(path).suffix)
+        if reader is None:
+            continue
+        df = reader(path)
+        if "player_id" not in df.columns:
+            # Same ids the prediction DAG uses when it feeds players in: <input file>:<row>
+            source = Path(path).name.removeprefix("predicted_")
+            df["player_id"] = [f"{source}:{i}" for i in range(len(df))]
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=NUMERIC_COLUMNS + ["player_id"])
+    return pd.concat(frames, ignore_index=True)
+
+
+_player_index = PlayerIndex.from_frame(pd.DataFrame(columns=NUMERIC_COLUMNS))
+# Serializes writers (upserts, deletes, compaction); searches never take it
+_update_lock = threading.Lock()
+_compactor: Optional[threading.Thread] = None
+_stop_compactor = threading.Event()
+
+
+def get_player_index() -> PlayerIndex:
+    return _player_index
+
+
+def load_player_index(pattern: str = PLAYER_DATA_GLOB) -> PlayerIndex:
+    # Build the new index fully before swapping it in, so queries never see a half-built one
+    global _player_index
+    snapshot = PlayerIndex.load(SNAPSHOT_DIR) if (SNAPSHOT_DIR / "index.json").exists() else None
+    if snapshot is not None and snapshot.fitted:
+        _player_index = snapshot
+    else:
+        _player_index = PlayerIndex.from_frame(load_player_frame(pattern))
+        # An empty index is not snapshotted, so its placeholder stats never outlive a restart
+        if _player_index.fitted:
+            _player_index.save(SNAPSHOT_DIR)
+    logger.info("Indexed %d players for similarity search", len(_player_index))
+    return _player_index
+
+
+def upsert_players(df: pd.DataFrame) -> int:
+    with _update_lock:
+        return _player_index.upsert(df)
+
+
+def delete_players(player_ids: Iterable[str]) -> int:
+    with _update_lock:
+        return _player_index.delete(player_ids)
+
+
+def compact_player_index() -> PlayerIndex:
+    # Writers wait for the rebuild, so no update can land on the index being replaced
+    global _player_index
+    with _update_lock:
+        compacted = _player_index.compacted()
+        _player_index = compacted
+        if compacted.fitted:
+            compacted.save(SNAPSHOT_DIR)
+    return compacted
+
+
+def _compact_periodically():
+    while not _stop_compactor.wait(COMPACT_INTERVAL):
+        if _player_index.changes:
+            try:
+                compact_player_index()
+            except Exception as e:
+                logger.error("Similarity index compaction failed: %s", e)
+
+
+def start_compactor():
+    global _compactor
+    if COMPACT_INTERVAL <= 0 or _compactor is not None:
+        return
+    _stop_compactor.clear()
+    _compactor = threading.Thread(target=_compact_periodically, name="similarity-compactor", daemon=True)
+    _compactor.start()
+
+
+def stop_compactor():
+    global _compactor
+    _stop_compactor.set()
+    if _compactor is not None:
+        _compactor.join()
+        _compactor = None
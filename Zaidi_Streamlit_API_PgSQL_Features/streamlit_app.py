@@ -32,7 +32,11 @@ else:
                         data = response.json()
                         st.session_state["token"] = data["access_token"]
                         st.session_state["username"] = username
-                        st.session_state["role"] = "user"  # Placeholder — later fetch from /me
+                        me = requests.get(
+                            f"{API_URL}/me",
+                            headers={"Authorization": f"Bearer {data['access_token']}"},
+                        )
+                        st.session_state["role"] = me.json().get("role", "user") if me.status_code == 200 else "user"
                         st.success("✅ Login successful!")
                         st.experimental_rerun()
                     else:
@@ -0,0 +1,48 @@
+import os
+import sys
+from pathlib import Path
+
+import joblib
+import pandas as pd
+
+from feature_schema import CATEGORICAL_COLUMNS, EXPECTED_COLUMNS, NUMERIC_COLUMNS
+from model_registry import MODEL_PATHS
+from preprocessing import FeaturePreprocessor, preprocessor_path
+
+TARGET = "overall"
+
+
+def train(training_csv: str, model_path: Path):
+    # Produces both artifacts the "fifa_overall" registry entry loads: the regressor and,
+    # next to it, the preprocessor whose output layout it was trained on
+    from sklearn.ensemble import HistGradientBoostingRegressor
+
+    df = pd.read_csv(training_csv)
+    missing = [col for col in EXPECTED_COLUMNS + [TARGET] if col not in df.columns]
+    if missing:
+        raise ValueError(f"Training data is missing columns: {missing}")
+    df = df.dropna(subset=[TARGET])
+
+    preprocessor = FeaturePreprocessor.fit(df, NUMERIC_COLUMNS, list(CATEGORICAL_COLUMNS))
+    X = preprocessor.transform_columns({col: df[col].to_numpy() for col in EXPECTED_COLUMNS}, len(df))
+    model = HistGradientBoostingRegressor(random_state=0).fit(X, df[TARGET].to_numpy())
+
+    # Each artifact is written to a temp file and renamed into place, preprocessor first: the
+    # registry's hot reload only reacts to the model file, so it loads the pair once the model lands
+    model_path = Path(model_path)
+    preprocessor_file = preprocessor_path(model_path)
+    preprocessor_tmp = preprocessor_file.with_name(preprocessor_file.name + ".tmp")
+    preprocessor.save(preprocessor_tmp)
+    os.replace(preprocessor_tmp, preprocessor_file)
+    model_tmp = model_path.with_name(model_path.name + ".tmp")
+    joblib.dump(model, model_tmp)
+    os.replace(model_tmp, model_path)
+    return model, len(df)
+
+
+if __name__ == "__main__":
+    # Usage: python train_fifa_model.py <training_csv> [model_path]
+    # training_csv holds the FIFA feature columns (feature_schema.EXPECTED_COLUMNS) plus `overall`
+    model_path = Path(sys.argv[2]) if len(sys.argv) > 2 else MODEL_PATHS["fifa_overall"]
+    _, rows = train(sys.argv[1], model_path)
+    print(f"Saved fifa_overall model to {model_path} (trained on {rows} rows)")
@@ -1,14 +1,20 @@
 from pendulum import datetime
 from pathlib import Path
-import subprocess
+import os
 import duckdb
 
 from airflow import DAG
-from airflow.decorators import task
-from airflow.exceptions import AirflowSkipException
+from airflow.decorators import task, task_group
+from airflow.operators.python import get_current_context
+from airflow.sensors.base import PokeReturnValue
 from airflow.providers.postgres.hooks.postgres import PostgresHook  # if you're logging stats
 from airflow.operators.python import PythonOperator
 from modules.gxe_ingestion_stats.gx_stats import parse_gxe_output  # your custom parser
+from modules.data_zones.zones import SUFFIXES, ZONE_FORMAT, zone_path, zone_schema
+from modules.ingestion_queue.raw_queue import claim_raw_files, finish_raw_file, sweep_stale_claims
+from modules.ingestion_staging.staging import StagingArea, staging_key
+from modules.native_validation.engine import definitions_from_gx_suite, validate_relation
+from modules.native_validation.streaming import validate_csv_stream
 
 from great_expectations import ExpectationSuite
 import great_expectations.expectations as gxe
@@ -55,88 +61,163 @@ expectation_suite = ExpectationSuite(
 
 # ─── DAG Definition ───────────────────────────────────────────────────
 
+RAW_DIR = Path("/opt/airflow/data/raw_data")
+INGESTING_DIR = Path("/opt/airflow/data/ingesting")  # claimed by a run, being ingested
+INGESTED_DIR = Path("/opt/airflow/data/ingested")    # already split into good/bad data
+FAILED_DIR = Path("/opt/airflow/data/failed")        # claimed but never ingested (see sweep_stale_claims)
+# Claims older than this are considered abandoned; keep it above the slowest file's ingestion time
+CLAIM_TIMEOUT_MINUTES = int(os.getenv("INGEST_CLAIM_TIMEOUT_MINUTES", "180"))
+GOOD_DIR = Path("/opt/airflow/data/good_data")
+BAD_DIR = Path("/opt/airflow/data/bad_data")
+# Files claimed per run; each one is ingested by its own mapped ingest_file group
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "16"))
+# "native" checks the suite in one DuckDB pass over the staged table; "gx" runs Great Expectations on pandas
+VALIDATION_ENGINE = os.getenv("INGEST_VALIDATION_ENGINE", "native")
+# Files at least this large skip staging and are validated and split batch by batch (native engine only)
+STREAMING_THRESHOLD_BYTES = int(os.getenv("INGEST_STREAMING_THRESHOLD_BYTES", str(512 * 1024 * 1024)))
+
+# Columns without a value-set expectation are numeric
+SET_COLUMNS = {
+    e.configuration.kwargs["column"] for e in expectation_suite.expectations
+    if e.expectation_type == "expect_column_values_to_be_in_set"
+}
+NUMERIC_COLUMNS = [col for col in EXPECTED_COLUMNS if col not in SET_COLUMNS]
+# Explicit good_data schema, applied when the zones are stored as Parquet (DATA_ZONE_FORMAT)
+GOOD_SCHEMA = zone_schema(EXPECTED_COLUMNS, NUMERIC_COLUMNS)
+
+
+def use_streaming(file_path):
+    return VALIDATION_ENGINE == "native" and os.path.getsize(file_path) >= STREAMING_THRESHOLD_BYTES
+
+# Staged copies are keyed by run id, map index and file, and removed once the file is saved
+staging = StagingArea(Path("/opt/airflow/data/staging"))
+
+
+def current_key(ti, file_path):
+    return staging_key(ti.run_id, ti.map_index, file_path)
+
+
 with DAG(
     dag_id="ingestion_dag",
-    schedule_interval="*/1 * * * *",
+    schedule="@continuous",  # the next run starts (and waits on the sensor) as soon as one finishes
     start_date=datetime(2025, 1, 1),
     catchup=False,
     max_active_runs=1,
     tags=["gnn", "ingestion"],
 ) as dag:
 
-    @task()
-    def read_data():
-        raw_dir = Path("/opt/airflow/data/raw_data")
-        if list(raw_dir.glob("*.csv")):
-            selected_file = subprocess.getoutput("bash $AIRFLOW_HOME/scripts/shell/random_file.sh").strip()
-            duckdb.connect("ingest.ddb").execute(
-                f"CREATE OR REPLACE TABLE latest AS SELECT * FROM read_csv_auto('{selected_file}', nullstr='');"
-            )
-            return selected_file
-        else:
-            raise AirflowSkipException("No CSV files found in raw_data")
+    @task.sensor(poke_interval=10, timeout=60 * 60, mode="reschedule", soft_fail=True)
+    def wait_for_raw_files():
+        # Fires as soon as raw_data has files and hands over up to INGEST_BATCH_SIZE of them, oldest first
+        sweep_stale_claims(INGESTING_DIR, FAILED_DIR, CLAIM_TIMEOUT_MINUTES * 60)
+        claimed = claim_raw_files(RAW_DIR, INGESTING_DIR, INGEST_BATCH_SIZE)
+        return PokeReturnValue(is_done=bool(claimed), xcom_value=claimed)
+
+    def current_file(ti):
+        # Each mapped ingest_file instance works on the file its own read_data staged
+        return ti.xcom_pull(task_ids="ingest_file.read_data", map_indexes=ti.map_index)
 
     def retrieve_df_for_gx_validation():
         try:
-            return duckdb.connect("ingest.ddb").execute("SELECT * FROM latest").fetchdf()
-        except duckdb.CatalogException:
+            ti = get_current_context()["ti"]
+            return staging.dataframe(current_key(ti, current_file(ti)))
+        except duckdb.Error:
             return 0
 
-    validate_data = GXValidateDataFrameOperator(
-        task_id="validate_data",
-        configure_dataframe=retrieve_df_for_gx_validation,
-        expect=expectation_suite,
-        context_type="ephemeral",
-        result_format="COMPLETE"
-    )
-    @task()
-    def save_file(ti):
-        import duckdb
-
-        conn = duckdb.connect("ingest.ddb")
-        df = conn.execute("SELECT * FROM latest").fetchdf()
-
-        file_path = ti.xcom_pull(task_ids="read_data", key="return_value")
-        file_name = Path(file_path).name
-        good_path = f"/opt/airflow/data/good_data/{file_name}"
-        bad_path = f"/opt/airflow/data/bad_data/bad_{file_name}"
-
-        gx_output = ti.xcom_pull(task_ids="validate_data", key="return_value")
-        success = gx_output["success"]
-        column_check_passed = any(
-            r["expectation_type"] == "expect_table_columns_to_match_set" and r["success"]
-            for r in gx_output["expectations"]
-        )
-
-        if success and column_check_passed:
-            conn.execute(f"COPY (SELECT * FROM latest) TO '{good_path}' (HEADER, DELIMITER ',');")
-            return
-
-        if column_check_passed:
-            bad_rows = set()
-            for r in gx_output["expectations"]:
-                if not r["success"]:
-                    idxs = r.get("result", {}).get("unexpected_index_list", [])
-                    bad_rows |= set(idxs)
-
-            if bad_rows:
-                ids = ", ".join(str(i) for i in sorted(bad_rows))
-                conn.execute(f"""
-                    COPY (
-                        WITH tmp AS (SELECT *, row_number() OVER () - 1 AS rn FROM latest)
-                        SELECT * EXCLUDE rn FROM tmp WHERE rn IN ({ids})
-                    ) TO '{bad_path}' (HEADER, DELIMITER ',');
-                """)
-                conn.execute(f"""
-                    COPY (
-                        WITH tmp AS (SELECT *, row_number() OVER () - 1 AS rn FROM latest)
-                        SELECT * EXCLUDE rn FROM tmp WHERE rn NOT IN ({ids})
-                    ) TO '{good_path}' (HEADER, DELIMITER ',');
-                """)
+    @task_group(group_id="ingest_file")
+    def ingest_file(path):
+
+        @task()
+        def read_data(selected_file, ti=None):
+            if not use_streaming(selected_file):
+                staging.stage(current_key(ti, selected_file), selected_file)
+            return selected_file
+
+        if VALIDATION_ENGINE == "native":
+            @task(task_id="validate_data")
+            def validate_native(ti=None):
+                # Same expectations and result shape as the GX operator, computed column-wise in DuckDB
+                file_path = current_file(ti)
+                key = current_key(ti, file_path)
+                definitions = definitions_from_gx_suite(expectation_suite)
+                if use_streaming(file_path):
+                    # Large file: validate record batch by record batch, writing good/bad rows as we go
+                    suffix = SUFFIXES[ZONE_FORMAT]
+                    return validate_csv_stream(
+                        file_path, definitions,
+                        str(staging.output_path(key, "good", suffix)), str(staging.output_path(key, "bad", suffix)),
+                        NUMERIC_COLUMNS, good_schema=GOOD_SCHEMA,
+                    )
+                with staging.connect(key) as conn:
+                    return validate_relation(conn, "staged", definitions)
+
+            validate_data = validate_native()
+        else:
+            validate_data = GXValidateDataFrameOperator(
+                task_id="validate_data",
+                configure_dataframe=retrieve_df_for_gx_validation,
+                expect=expectation_suite,
+                context_type="ephemeral",
+                result_format="COMPLETE"
+            )
+
+        @task()
+        def save_file(ti):
+            file_path = current_file(ti)
+            key = current_key(ti, file_path)
+
+            file_name = Path(file_path).name
+            good_path = zone_path(GOOD_DIR, file_name)
+            bad_path = zone_path(BAD_DIR, f"bad_{file_name}")
+
+            if use_streaming(file_path):
+                # Outputs were already written during validation; publish whichever got rows
+                for kind, target in (("good", good_path), ("bad", bad_path)):
+                    staged_output = staging.output_path(key, kind, target.suffix)
+                    if staged_output.exists():
+                        target.parent.mkdir(parents=True, exist_ok=True)
+                        os.replace(staged_output, target)
+                finish_raw_file(file_path, INGESTED_DIR)
+                staging.cleanup(key)
                 return
 
-        conn.execute(f"COPY (SELECT * FROM latest) TO '{bad_path}' (HEADER, DELIMITER ',');")
+            gx_output = ti.xcom_pull(task_ids="ingest_file.validate_data", map_indexes=ti.map_index)
+            success = gx_output["success"]
+            column_check_passed = any(
+                r["expectation_type"] == "expect_table_columns_to_match_set" and r["success"]
+                for r in gx_output["expectations"]
+            )
+
+            def split():
+                if success and column_check_passed:
+                    staging.write(key, good_path, GOOD_SCHEMA)
+                    return
+
+                if column_check_passed:
+                    bad_rows = set()
+                    for r in gx_output["expectations"]:
+                        if not r["success"]:
+                            idxs = r.get("result", {}).get("unexpected_index_list", [])
+                            bad_rows |= set(idxs)
+
+                    if bad_rows:
+                        staging.split(key, bad_rows, good_path, bad_path, GOOD_SCHEMA)
+                        return
+
+                # Bad rows keep the types they were staged with: they may not fit the schema
+                staging.write(key, bad_path)
+
+            split()
+            # Moved only once its outputs exist, so a retried save_file still finds the file
+            finish_raw_file(file_path, INGESTED_DIR)
+            staging.cleanup(key)
+
+        _read = read_data(path)
+        _save = save_file()
+        _read >> validate_data >> _save
+
+    @task(trigger_rule="all_done")
+    def cleanup_staging(run_id=None):
+        staging.cleanup_run(run_id)
 
-    _read = read_data()
-    _save = save_file()
-    _read >> validate_data >> _save
+    ingest_file.expand(path=wait_for_raw_files()) >> cleanup_staging()
@@ -0,0 +1,71 @@
+import os
+from datetime import date
+from pathlib import Path
+
+# Storage format of good_data / bad_data / predicted_data: "csv" (flat files) or "parquet"
+# (zstd-compressed, explicit schema, one ingestion_date=YYYY-MM-DD directory per day)
+ZONE_FORMAT = os.getenv("DATA_ZONE_FORMAT", "csv")
+SUFFIXES = {"csv": ".csv", "parquet": ".parquet"}
+# Readers accept both formats, so flipping ZONE_FORMAT needs no migration of existing files
+ZONE_PATTERNS = tuple(f"*{suffix}" for suffix in SUFFIXES.values())
+PARTITION_PREFIX = "ingestion_date="
+
+if ZONE_FORMAT not in SUFFIXES:
+    raise ValueError(f"DATA_ZONE_FORMAT must be one of {sorted(SUFFIXES)}, got {ZONE_FORMAT!r}")
+
+
+def zone_schema(columns: list, numeric_columns: list) -> dict:
+    # DuckDB types for the good zone: numeric features as DOUBLE (what the model consumes), the rest text
+    numeric = set(numeric_columns)
+    return {col: "DOUBLE" if col in numeric else "VARCHAR" for col in columns}
+
+
+def zone_path(zone_dir, name: str, partition: str = None, fmt: str = ZONE_FORMAT) -> Path:
+    # CSV keeps the flat layout; Parquet files go under the ingestion date partition
+    file_name = Path(name).stem + SUFFIXES[fmt]
+    if fmt == "csv":
+        return Path(zone_dir) / file_name
+    partition = partition or f"{PARTITION_PREFIX}{date.today().isoformat()}"
+    return Path(zone_dir) / partition / file_name
+
+
+def partition_of(path) -> str:
+    # Ingestion date partition a zone file lives in, so derived files land in the same one
+    parent = Path(path).parent.name
+    return parent if parent.startswith(PARTITION_PREFIX) else None
+
+
+def copy_options(path) -> str:
+    if Path(path).suffix == SUFFIXES["parquet"]:
+        return "FORMAT parquet, COMPRESSION zstd"
+    return "HEADER, DELIMITER ','"
+
+
+def read_relation(path) -> str:
+    # Parquet carries its schema; only CSV needs parsing and type inference
+    path = str(path).replace("'", "''")
+    if Path(path).suffix == SUFFIXES["parquet"]:
+        # The ingestion_date directory is layout, not data: don't add it as a column
+        return f"read_parquet('{path}', hive_partitioning = false)"
+    return f"read_csv_auto('{path}')"
+
+
+def typed_select(schema: dict, source: str) -> str:
+    columns = ", ".join(f'CAST("{col}" AS {sql_type}) AS "{col}"' for col, sql_type in schema.items())
+    return f"SELECT {columns} FROM {source}"
+
+
+def write_relation(conn, select_sql: str, path, schema: dict = None):
+    # COPY a query into a zone file; Parquet output is cast to the explicit schema when one is given
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    if schema is not None and Path(path).suffix == SUFFIXES["parquet"]:
+        select_sql = typed_select(schema, f"({select_sql})")
+    conn.execute(f"COPY ({select_sql}) TO '{path}' ({copy_options(path)});")
+
+
+def write_frame(df, path):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    if Path(path).suffix == SUFFIXES["parquet"]:
+        df.to_parquet(path, index=False, compression="zstd")
+    else:
+        df.to_csv(path, index=False)
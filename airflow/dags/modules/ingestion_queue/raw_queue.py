@@ -0,0 +1,66 @@
+import os
+import time
+from pathlib import Path
+
+
+def pending_raw_files(raw_dir: Path, pattern: str = "*.csv") -> list:
+    # Arrival order: oldest modification time first, file name as tie-breaker
+    files = [path for path in raw_dir.glob(pattern) if path.is_file()]
+    return sorted(files, key=lambda path: (path.stat().st_mtime, path.name))
+
+
+def claim_raw_files(raw_dir: Path, ingesting_dir: Path, limit: int) -> list:
+    # A file is claimed by renaming it out of raw_data; rename is atomic, so when two runs race
+    # for the same file exactly one of them gets it and the other just moves on
+    ingesting_dir.mkdir(parents=True, exist_ok=True)
+    claimed = []
+    for path in pending_raw_files(raw_dir):
+        if len(claimed) >= limit:
+            break
+        target = ingesting_dir / path.name
+        if target.exists():
+            # A same-named file is still being ingested (or stuck); never overwrite it
+            print(f"⚠️ {path.name} is already in {ingesting_dir}, leaving the new one in {raw_dir}")
+            continue
+        try:
+            os.rename(path, target)
+        except FileNotFoundError:
+            continue
+        # mtime now records the claim time, which the stale-claim sweep goes by
+        os.utime(target)
+        claimed.append(str(target))
+    return claimed
+
+
+def sweep_stale_claims(ingesting_dir: Path, failed_dir: Path, max_age_seconds: float) -> list:
+    # Files whose ingestion failed for good (tasks out of retries) or whose worker died stay in
+    # ingesting/ after their claim; park them in failed/ instead of letting them sit there unseen
+    if not ingesting_dir.exists():
+        return []
+    cutoff = time.time() - max_age_seconds
+    swept = []
+    for path in ingesting_dir.iterdir():
+        try:
+            if not path.is_file() or path.stat().st_mtime > cutoff:
+                continue
+        except FileNotFoundError:
+            continue
+        failed_dir.mkdir(parents=True, exist_ok=True)
+        target = failed_dir / path.name
+        if target.exists():
+            target = failed_dir / f"{path.stem}.{int(time.time())}{path.suffix}"
+        try:
+            os.rename(path, target)
+        except FileNotFoundError:
+            continue
+        print(f"❌ {path.name} was claimed over {max_age_seconds / 60:.0f} min ago and never ingested, moved to {target}")
+        swept.append(str(target))
+    return swept
+
+
+def finish_raw_file(path: str, ingested_dir: Path) -> str:
+    # Ingested raw files are kept, out of the way of the sensor
+    ingested_dir.mkdir(parents=True, exist_ok=True)
+    target = ingested_dir / Path(path).name
+    os.replace(path, target)
+    return str(target)
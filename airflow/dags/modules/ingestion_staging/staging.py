@@ -0,0 +1,109 @@
+import os
+import re
+import shutil
+from pathlib import Path
+
+import duckdb
+
+from modules.data_zones.zones import read_relation, write_relation
+
+TABLE = "staged"
+
+
+def staging_key(run_id: str, map_index: int, file_path: str) -> str:
+    # Unique per DAG run, mapped instance and file, and safe to use as a file name
+    raw = f"{run_id}__{map_index}__{Path(file_path).stem}"
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", raw)
+
+
+def _run_prefix(run_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", f"{run_id}__")
+
+
+class StagingArea:
+    # One DuckDB database per staged file: no shared table to clobber and no shared lock,
+    # so mapped instances and concurrent runs stage side by side
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def path(self, key: str) -> Path:
+        return self.root / f"{key}.ddb"
+
+    def stage(self, key: str, csv_path: str) -> str:
+        self.root.mkdir(parents=True, exist_ok=True)
+        with duckdb.connect(str(self.path(key))) as conn:
+            conn.execute(
+                f"CREATE OR REPLACE TABLE {TABLE} AS SELECT * FROM read_csv_auto(?, nullstr='')",
+                [csv_path],
+            )
+        return key
+
+    def output_path(self, key: str, kind: str, suffix: str = ".csv") -> Path:
+        # Outputs written while streaming, published into good_data/bad_data by save_file
+        self.root.mkdir(parents=True, exist_ok=True)
+        return self.root / f"{key}.{kind}{suffix}"
+
+    def connect(self, key: str, read_only: bool = True):
+        return duckdb.connect(str(self.path(key)), read_only=read_only)
+
+    def arrow(self, key: str):
+        # Columnar result straight from DuckDB; no intermediate pandas materialisation
+        with self.connect(key) as conn:
+            return conn.execute(f"SELECT * FROM {TABLE}").fetch_arrow_table()
+
+    def dataframe(self, key: str):
+        # For pandas-only consumers (GX): split_blocks/self_destruct let numeric columns reuse the
+        # Arrow buffers instead of being consolidated into fresh 2-D blocks
+        return self.arrow(key).to_pandas(split_blocks=True, self_destruct=True)
+
+    def write(self, key: str, path, schema: dict = None):
+        with self.connect(key) as conn:
+            write_relation(conn, f"SELECT * FROM {TABLE}", path, schema)
+
+    def split(self, key: str, bad_rows, good_path, bad_path, good_schema: dict = None):
+        # One scan of the staged table: failing row numbers are joined in as a table rather than
+        # spelled out in the SQL, and PARTITION_BY writes the good and bad rows in the same pass
+        import numpy as np
+        import pyarrow as pa
+
+        out_dir = self.root / f"{key}.split"
+        shutil.rmtree(out_dir, ignore_errors=True)
+        parquet = Path(good_path).suffix == ".parquet"
+        fmt = "parquet" if parquet else "csv, HEADER, DELIMITER ','"
+        bad_table = pa.table({"rn": pa.array(np.asarray(sorted(bad_rows), dtype=np.int64))})
+        with self.connect(key) as conn:
+            conn.register("bad_rows", bad_table)
+            conn.execute(f"""
+                COPY (
+                    SELECT *, rowid IN (SELECT rn FROM bad_rows) AS is_bad FROM {TABLE}
+                ) TO '{out_dir}' (FORMAT {fmt}, PARTITION_BY (is_bad));
+            """)
+            # Only partitions that received rows exist
+            for is_bad, target in ((False, good_path), (True, bad_path)):
+                part = next((out_dir / f"is_bad={str(is_bad).lower()}").glob("data_*"), None)
+                if part is None:
+                    continue
+                if is_bad or good_schema is None or not parquet:
+                    Path(target).parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(part, target)
+                else:
+                    # Staged types depend on what read_csv_auto inferred (a bad value turns a
+                    # column into text); the good rows are re-typed to the zone's schema
+                    write_relation(conn, f"SELECT * FROM {read_relation(part)}", target, good_schema)
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    def cleanup(self, key: str):
+        for path in self.root.glob(f"{key}.*"):
+            _remove(path)
+
+    def cleanup_run(self, run_id: str):
+        # Sweeps whatever a run left behind, including instances that failed before their own cleanup
+        for path in self.root.glob(f"{_run_prefix(run_id)}*"):
+            _remove(path)
+
+
+def _remove(path: Path):
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
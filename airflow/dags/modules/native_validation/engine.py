@@ -0,0 +1,276 @@
+# Compiles the GX expectation definitions used by ingestion_dag into one DuckDB aggregate query
+# and reports the outcome in the shape GXValidateDataFrameOperator returns (describe_dict), so
+# save_file and gx_stats.parse_gxe_output consume either engine unchanged.
+# GX validates the staged table as a pandas DataFrame, so values are judged the way pandas holds
+# them: NaN counts as missing, and integer columns with nulls become float64.
+# tests/test_native_validation_parity.py checks the two engines against each other.
+
+import numpy as np
+
+PARTIAL_UNEXPECTED_COUNT = 20
+
+TABLE_EXPECTATIONS = {"expect_table_column_count_to_equal", "expect_table_columns_to_match_set"}
+
+
+def _ident(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _literal(value) -> str:
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return repr(value)
+
+
+def definitions_from_gx_suite(suite) -> list:
+    # (expectation_type, kwargs) pairs straight from the GX suite, so both engines check the same rules
+    return [
+        (expectation.expectation_type, dict(expectation.configuration.kwargs))
+        for expectation in suite.expectations
+    ]
+
+
+# DuckDB types and the pandas dtype the staged column gets; anything else is an object column
+INTEGER_DTYPES = {
+    "TINYINT": "int8", "SMALLINT": "int16", "INTEGER": "int32", "BIGINT": "int64",
+    "UTINYINT": "uint8", "USMALLINT": "uint16", "UINTEGER": "uint32", "UBIGINT": "uint64",
+}
+PANDAS_DTYPES = {**INTEGER_DTYPES, "FLOAT": "float32", "DOUBLE": "float64", "BOOLEAN": "bool"}
+NUMERIC_TYPES = set(INTEGER_DTYPES) | {"FLOAT", "DOUBLE"}
+# Type names GX accepts for every value of an object column (it checks them one by one)
+OBJECT_VALUE_TYPES = {"VARCHAR": {"str", "object"}}
+
+
+def _pandas_dtype(column_type: str, has_nulls: bool) -> str:
+    if column_type in INTEGER_DTYPES and has_nulls:
+        return "float64"
+    return PANDAS_DTYPES.get(column_type, "object")
+
+
+def _same_dtype(type_: str, dtype: str) -> bool:
+    try:
+        return np.dtype(type_) == np.dtype(dtype)
+    except TypeError:
+        return False
+
+
+def _missing(col: str, column_type: str) -> str:
+    # What pandas reports as null: NULL, and NaN in float columns
+    if column_type in ("FLOAT", "DOUBLE"):
+        return f"({col} IS NULL OR isnan({col}))"
+    return f"{col} IS NULL"
+
+
+def _value(col: str, column_type: str) -> str:
+    # Sampled unexpected values keep their type where it survives XCom's JSON (numbers, text, booleans)
+    if column_type in PANDAS_DTYPES or column_type == "VARCHAR":
+        return col
+    return f"CAST({col} AS VARCHAR)"
+
+
+def _failure_predicate(expectation_type: str, kwargs: dict, column_types: dict):
+    # Row-level "unexpected" condition; like GX, missing values are only unexpected for the not-null expectation
+    column_type = column_types[kwargs["column"]]
+    col = _ident(kwargs["column"])
+    missing = _missing(col, column_type)
+    if expectation_type == "expect_column_values_to_not_be_null":
+        return missing
+    present = f"NOT {missing}"
+    if expectation_type == "expect_column_values_to_be_in_set":
+        if column_type in NUMERIC_TYPES:
+            # Compared as numbers, so 1.0 in a DOUBLE column is in {1, 2, 3}
+            values = [v for v in kwargs["value_set"] if isinstance(v, (int, float)) and not isinstance(v, bool)]
+            if not values:
+                return present
+            return f"({present} AND {col} NOT IN ({', '.join(repr(v) for v in values)}))"
+        values = ", ".join(_literal(str(v)) for v in kwargs["value_set"])
+        return f"({present} AND CAST({col} AS VARCHAR) NOT IN ({values}))"
+    if expectation_type == "expect_column_values_to_be_between":
+        number = f"TRY_CAST({col} AS DOUBLE)"
+        checks = [f"{number} IS NULL"]  # present but not numeric
+        if kwargs.get("min_value") is not None:
+            checks.append(f"{number} {'<=' if kwargs.get('strict_min') else '<'} {kwargs['min_value']}")
+        if kwargs.get("max_value") is not None:
+            checks.append(f"{number} {'>=' if kwargs.get('strict_max') else '>'} {kwargs['max_value']}")
+        return f"({present} AND ({' OR '.join(checks)}))"
+    if expectation_type == "expect_column_values_to_match_regex":
+        return f"({present} AND NOT regexp_matches(CAST({col} AS VARCHAR), {_literal(kwargs['regex'])}))"
+    if expectation_type == "expect_column_values_to_be_of_type":
+        # Only object columns are checked value by value; for typed columns the dtype decides (see
+        # _column_result) and this only collects the null count that decides it for integers
+        if column_type in PANDAS_DTYPES or kwargs["type_"] in OBJECT_VALUE_TYPES.get(column_type, {"object"}):
+            return "FALSE"
+        return present
+    return None
+
+
+SUPPORTED_EXPECTATIONS = TABLE_EXPECTATIONS | {
+    "expect_column_values_to_not_be_null",
+    "expect_column_values_to_be_in_set",
+    "expect_column_values_to_be_between",
+    "expect_column_values_to_match_regex",
+    "expect_column_values_to_be_of_type",
+}
+
+
+class NativeValidation:
+    # Accumulates results over one or more relations (e.g. record batches) validated in order;
+    # row offsets keep unexpected_index_list global across batches. With max_indexes set, only
+    # that many failing row numbers are kept per expectation and unexpected_index_list is left out
+    # (partial_unexpected_index_list still has the first ones) while counts stay exact, so memory
+    # does not grow with the file
+    def __init__(self, definitions: list, max_indexes: int = None):
+        unsupported = {t for t, _ in definitions} - SUPPORTED_EXPECTATIONS
+        if unsupported:
+            raise ValueError(f"Not supported by the native engine (use the GX engine): {sorted(unsupported)}")
+        self.definitions = definitions
+        self.max_indexes = max_indexes
+        self.rows = 0
+        self.columns = None
+        self.column_types = None
+        self._counts = {}
+        self._missing = {}
+        self._indexes = {}
+        self._partial = {}
+
+    def add(self, conn, relation: str, row_offset: int = None, row_number_column: str = None):
+        # Returns the row numbers in this relation that failed at least one expectation.
+        # row_number_column names a column already holding global row numbers (e.g. added to an
+        # Arrow batch); otherwise rows are numbered in scan order starting at row_offset
+        row_offset = self.rows if row_offset is None else row_offset
+        described = conn.execute(f"DESCRIBE SELECT * FROM {relation}").fetchall()
+        if row_number_column is not None:
+            described = [row for row in described if row[0] != row_number_column]
+        if self.columns is None:
+            self.columns = [row[0] for row in described]
+            self.column_types = {row[0]: row[1].split("(")[0] for row in described}
+
+        selects = ["count(*)"]
+        compiled = []
+        for i, (expectation_type, kwargs) in enumerate(self.definitions):
+            column = kwargs.get("column")
+            if column is None or column not in self.column_types:
+                continue
+            predicate = _failure_predicate(expectation_type, kwargs, self.column_types)
+            if predicate is None:
+                continue
+            col = _ident(column)
+            column_type = self.column_types[column]
+            compiled.append(i)
+            selects += [
+                f"count(*) FILTER (WHERE {predicate})",
+                f"count(*) FILTER (WHERE {_missing(col, column_type)})",
+                f"list(__rn ORDER BY __rn) FILTER (WHERE {predicate})",
+                f"array_slice(list({_value(col, column_type)} ORDER BY __rn) FILTER (WHERE {predicate}), 1, {PARTIAL_UNEXPECTED_COUNT})",
+            ]
+
+        if row_number_column is not None:
+            numbered = f"(SELECT * EXCLUDE ({_ident(row_number_column)}), {_ident(row_number_column)} AS __rn FROM {relation})"
+        else:
+            numbered = f"(SELECT *, row_number() OVER () - 1 + {int(row_offset)} AS __rn FROM {relation})"
+
+        # One scan computes every expectation's counts and failing row numbers together
+        row = conn.execute(f"SELECT {', '.join(selects)} FROM {numbered}").fetchone()
+
+        self.rows += row[0]
+        failed = set()
+        for n, i in enumerate(compiled):
+            unexpected, missing, indexes, partial = row[1 + 4 * n: 5 + 4 * n]
+            self._counts[i] = self._counts.get(i, 0) + unexpected
+            self._missing[i] = self._missing.get(i, 0) + missing
+            kept = self._indexes.setdefault(i, [])
+            if self.max_indexes is None:
+                kept.extend(indexes or [])
+            else:
+                kept.extend((indexes or [])[:max(self.max_indexes - len(kept), 0)])
+            failed.update(indexes or [])
+            room = PARTIAL_UNEXPECTED_COUNT - len(self._partial.get(i, []))
+            self._partial.setdefault(i, []).extend((partial or [])[:max(room, 0)])
+        return failed
+
+    def table_checks_passed(self) -> bool:
+        return all(
+            self._table_result(expectation_type, kwargs)[0]
+            for expectation_type, kwargs in self.definitions
+            if expectation_type == "expect_table_columns_to_match_set"
+        )
+
+    def _table_result(self, expectation_type: str, kwargs: dict):
+        if expectation_type == "expect_table_column_count_to_equal":
+            return len(self.columns) == kwargs["value"], {"observed_value": len(self.columns)}
+        exact = kwargs.get("exact_match", True)
+        expected, observed = set(kwargs["column_set"]), set(self.columns)
+        success = observed == expected if exact else expected <= observed
+        return success, {"observed_value": list(self.columns)}
+
+    def _column_result(self, i: int, expectation_type: str, kwargs: dict):
+        column = kwargs["column"]
+        if column not in self.column_types:
+            return False, {}, {
+                "raised_exception": True,
+                "exception_message": f'The column "{column}" in BatchData does not exist.',
+            }
+        if expectation_type == "expect_column_values_to_be_of_type":
+            dtype = _pandas_dtype(self.column_types[column], self._missing[i] > 0)
+            if dtype != "object":
+                observed = np.dtype(dtype).type.__name__
+                return _same_dtype(kwargs["type_"], dtype), {"observed_value": observed}, None
+
+        unexpected, missing = self._counts[i], self._missing[i]
+        nonmissing = self.rows - missing
+        if expectation_type == "expect_column_values_to_not_be_null":
+            # Missing values are what this expectation counts, so GX reports no missing_* keys
+            result = {
+                "element_count": self.rows,
+                "unexpected_count": unexpected,
+                "unexpected_percent": 100 * unexpected / self.rows if self.rows else None,
+            }
+        else:
+            result = {
+                "element_count": self.rows,
+                "missing_count": missing,
+                "missing_percent": 100 * missing / self.rows if self.rows else None,
+                "unexpected_count": unexpected,
+                "unexpected_percent": 100 * unexpected / nonmissing if nonmissing else None,
+                "unexpected_percent_total": 100 * unexpected / self.rows if self.rows else None,
+                "unexpected_percent_nonmissing": 100 * unexpected / nonmissing if nonmissing else None,
+            }
+        result["partial_unexpected_list"] = self._partial[i]
+        result["partial_unexpected_index_list"] = self._indexes[i][:PARTIAL_UNEXPECTED_COUNT]
+        if self.max_indexes is None:
+            result["unexpected_index_list"] = self._indexes[i]
+        return unexpected == 0, result, None
+
+    def result(self) -> dict:
+        expectations = []
+        for i, (expectation_type, kwargs) in enumerate(self.definitions):
+            exception_info = None
+            if expectation_type in TABLE_EXPECTATIONS:
+                success, result = self._table_result(expectation_type, kwargs)
+            else:
+                success, result, exception_info = self._column_result(i, expectation_type, kwargs)
+            expectations.append({
+                "expectation_type": expectation_type,
+                "success": success,
+                "kwargs": kwargs,
+                "result": result,
+                "exception_info": exception_info or {"raised_exception": False},
+            })
+
+        successful = sum(e["success"] for e in expectations)
+        return {
+            "success": successful == len(expectations),
+            "statistics": {
+                "evaluated_expectations": len(expectations),
+                "successful_expectations": successful,
+                "unsuccessful_expectations": len(expectations) - successful,
+                "success_percent": 100 * successful / len(expectations) if expectations else None,
+            },
+            "expectations": expectations,
+        }
+
+
+def validate_relation(conn, relation: str, definitions: list) -> dict:
+    validation = NativeValidation(definitions)
+    validation.add(conn, relation)
+    return validation.result()
@@ -0,0 +1,115 @@
+import csv
+import os
+
+import numpy as np
+
+from modules.native_validation.engine import NativeValidation, _ident
+
+# Bytes of CSV parsed per record batch; memory use is bounded by this, not by the file size
+STREAM_BLOCK_BYTES = int(os.getenv("INGEST_STREAM_BLOCK_BYTES", str(16 * 1024 * 1024)))
+ROW_NUMBER = "__row_number"
+PARTIAL_INDEX_COUNT = 20
+
+
+class _LazyWriter:
+    # Output files are only created once they receive their first rows, with the schema of those
+    # rows; .parquet paths get a zstd Parquet writer
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+        self.rows = 0
+
+    def write(self, table):
+        import pyarrow.csv as pv
+        import pyarrow.parquet as pq
+
+        if table.num_rows == 0:
+            return
+        if self.writer is None:
+            if str(self.path).endswith(".parquet"):
+                self.writer = pq.ParquetWriter(self.path, table.schema, compression="zstd")
+            else:
+                self.writer = pv.CSVWriter(self.path, table.schema)
+        self.writer.write_table(table)
+        self.rows += table.num_rows
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def validate_csv_stream(csv_path: str, definitions: list, good_path: str, bad_path: str,
+                        numeric_columns: list, block_bytes: int = STREAM_BLOCK_BYTES,
+                        good_schema: dict = None) -> dict:
+    import duckdb
+    import pyarrow as pa
+    import pyarrow.csv as pv
+
+    with open(csv_path, newline="") as f:
+        header = next(csv.reader(f), [])
+
+    # Everything is read as text so the outputs keep the original values; the numeric columns are
+    # cast for validation only (unparseable values become NULL and fail the not-null expectation)
+    reader = pv.open_csv(
+        csv_path,
+        read_options=pv.ReadOptions(block_size=block_bytes),
+        convert_options=pv.ConvertOptions(
+            column_types={col: pa.string() for col in header},
+            null_values=[""],
+            strings_can_be_null=True,
+        ),
+    )
+    numeric = set(numeric_columns)
+    typed = ", ".join(
+        f"TRY_CAST({_ident(col)} AS DOUBLE) AS {_ident(col)}" if col in numeric else _ident(col)
+        for col in header
+    )
+
+    conn = duckdb.connect()
+    # Rows are routed batch by batch, so only a sample of failing indexes is kept (and sent through XCom)
+    validation = NativeValidation(definitions, max_indexes=PARTIAL_INDEX_COUNT)
+    good_typed = None
+    if good_schema is not None and str(good_path).endswith(".parquet"):
+        # Good rows passed the column-set check, so they can take the zone's explicit schema. The
+        # values are converted by the same DuckDB TRY_CAST validation used, so anything validation
+        # parsed (e.g. padded numbers like " 5") converts the same way here
+        good_typed = ", ".join(
+            f"TRY_CAST({_ident(col)} AS {sql_type}) AS {_ident(col)}" for col, sql_type in good_schema.items()
+        )
+    good = _LazyWriter(good_path)
+    bad = _LazyWriter(bad_path)
+    offset = 0
+    try:
+        for batch in reader:
+            numbered = batch.append_column(ROW_NUMBER, pa.array(np.arange(offset, offset + batch.num_rows)))
+            conn.register("raw_batch", numbered)
+            failed = validation.add(conn, f"(SELECT {typed}, {ROW_NUMBER} FROM raw_batch)", offset, ROW_NUMBER)
+            conn.unregister("raw_batch")
+
+            # Same routing as save_file: a wrong column set sends every row to bad_data
+            is_bad = np.zeros(batch.num_rows, dtype=bool)
+            if not validation.table_checks_passed():
+                is_bad[:] = True
+            elif failed:
+                is_bad[np.fromiter(failed, dtype=np.int64) - offset] = True
+            good_rows = pa.Table.from_batches([batch.filter(pa.array(~is_bad))])
+            if good_typed is not None and good_rows.num_rows:
+                conn.register("good_batch", good_rows)
+                good_rows = conn.execute(f"SELECT {good_typed} FROM good_batch").fetch_arrow_table()
+                conn.unregister("good_batch")
+            good.write(good_rows)
+            bad.write(pa.Table.from_batches([batch.filter(pa.array(is_bad))]))
+            offset += batch.num_rows
+
+        if validation.columns is None:
+            # Header-only file: validate an empty batch so the result still has its column checks
+            conn.register("raw_batch", pa.table({col: pa.array([], pa.string()) for col in header}))
+            validation.add(conn, f"(SELECT {typed} FROM raw_batch)", 0)
+    finally:
+        good.close()
+        bad.close()
+        conn.close()
+
+    result = validation.result()
+    result["streamed_rows"] = {"good": good.rows, "bad": bad.rows}
+    return result
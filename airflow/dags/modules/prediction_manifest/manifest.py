@@ -0,0 +1,138 @@
+import hashlib
+import os
+from pathlib import Path
+
+# Files claimed longer ago than this are considered abandoned (crashed worker) and can be claimed again
+CLAIM_TIMEOUT_MINUTES = int(os.getenv("PREDICTION_MANIFEST_CLAIM_TIMEOUT_MINUTES", "30"))
+
+DDL = """
+CREATE TABLE IF NOT EXISTS prediction_manifest (
+    path TEXT PRIMARY KEY,
+    size BIGINT NOT NULL,
+    mtime DOUBLE PRECISION NOT NULL,
+    content_hash TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending' CHECK (state IN ('pending', 'in_flight', 'done', 'failed')),
+    attempts INT NOT NULL DEFAULT 0,
+    error TEXT,
+    claimed_at TIMESTAMP,
+    claimed_hash TEXT,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+-- Manifests created before claimed_hash existed
+ALTER TABLE prediction_manifest ADD COLUMN IF NOT EXISTS claimed_hash TEXT;
+CREATE INDEX IF NOT EXISTS prediction_manifest_state_idx ON prediction_manifest (state, mtime);
+"""
+
+
+def ensure_manifest(conn):
+    with conn.cursor() as cur:
+        cur.execute(DDL)
+    conn.commit()
+
+
+def _content_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def register_files(conn, folder: Path, pattern: str = "*.csv") -> int:
+    # Only files that are new or whose size/mtime changed get hashed and upserted; a rewritten
+    # file goes back to pending unless its content is byte-for-byte the same. An in_flight file
+    # keeps its claim (a second run must not pick it up meanwhile); mark_done/mark_failed see the
+    # new hash and send it back to pending instead
+    # Recursive, so Parquet zones partitioned by ingestion date are picked up too
+    entries = {}
+    for path in Path(folder).rglob(pattern):
+        if path.is_file():
+            stat = path.stat()
+            entries[str(path)] = (stat.st_size, stat.st_mtime)
+    if not entries:
+        return 0
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT path, size, mtime FROM prediction_manifest WHERE path = ANY(%s)", (list(entries),))
+        known = {path: (size, mtime) for path, size, mtime in cur.fetchall()}
+        changed = [
+            (path, size, mtime, _content_hash(Path(path)))
+            for path, (size, mtime) in entries.items()
+            if known.get(path) != (size, mtime)
+        ]
+        for row in changed:
+            cur.execute(
+                """
+                INSERT INTO prediction_manifest AS m (path, size, mtime, content_hash)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (path) DO UPDATE SET
+                    size = EXCLUDED.size,
+                    mtime = EXCLUDED.mtime,
+                    content_hash = EXCLUDED.content_hash,
+                    state = CASE
+                        WHEN m.state = 'in_flight' OR m.content_hash = EXCLUDED.content_hash THEN m.state
+                        ELSE 'pending'
+                    END,
+                    updated_at = NOW()
+                """,
+                row,
+            )
+    conn.commit()
+    return len(changed)
+
+
+def import_checklist(conn, checklist: Path):
+    # One-off migration from prediction_checklist.txt: files listed there were already predicted
+    with open(checklist) as f:
+        done = [line.strip() for line in f if line.strip()]
+    with conn.cursor() as cur:
+        cur.execute("UPDATE prediction_manifest SET state = 'done', updated_at = NOW() WHERE path = ANY(%s)", (done,))
+    conn.commit()
+    checklist.rename(checklist.with_suffix(".txt.migrated"))
+
+
+def claim_files(conn, limit: int = 100) -> list:
+    # SKIP LOCKED makes the claim atomic across concurrent runs: each pending file goes to exactly one claimer
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE prediction_manifest
+            SET state = 'in_flight', claimed_at = NOW(), claimed_hash = content_hash,
+                attempts = attempts + 1, updated_at = NOW()
+            WHERE path IN (
+                SELECT path FROM prediction_manifest
+                WHERE state = 'pending'
+                   OR (state = 'in_flight' AND claimed_at < NOW() - %s * INTERVAL '1 minute')
+                ORDER BY mtime
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING path
+            """,
+            (CLAIM_TIMEOUT_MINUTES, limit),
+        )
+        paths = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    return paths
+
+
+# A file rewritten while it was in flight was processed with its old content: it goes back to
+# pending rather than done/failed
+_FINISH = """
+    UPDATE prediction_manifest
+    SET state = CASE WHEN content_hash <> claimed_hash THEN 'pending' ELSE %s END,
+        error = %s, updated_at = NOW()
+    WHERE path = ANY(%s)
+"""
+
+
+def mark_done(conn, paths: list):
+    with conn.cursor() as cur:
+        cur.execute(_FINISH, ("done", None, list(paths)))
+    conn.commit()
+
+
+def mark_failed(conn, paths: list, error: str):
+    with conn.cursor() as cur:
+        cur.execute(_FINISH, ("failed", error, list(paths)))
+    conn.commit()
@@ -1,100 +1,192 @@
+import os
 import pendulum
 from datetime import timedelta
 from airflow import DAG
 from airflow.operators.python import PythonOperator
 from airflow.exceptions import AirflowSkipException, AirflowException, AirflowFailException
 
-def _check_for_new_data(ti):
-    from pathlib import Path
-
-    folder = Path('/opt/airflow/data/good_data')
-    checklist = folder / 'prediction_checklist.txt'
-    files = list(folder.glob('*.csv'))
+# Postgres connection holding the prediction_manifest table (file path, size, mtime, hash, state)
+MANIFEST_CONN_ID = "postgres_default"
 
-    if not files:
-        raise AirflowSkipException("No good_data files found")
+API_URL = "http://host.docker.internal:8000"
+# HTTP connection holding the API service account (role "service") allowed to update the similarity index
+API_CONN_ID = "prediction_api"
+# Rows per /predict request and requests in flight per file
+CHUNK_ROWS = int(os.getenv("PREDICTION_CHUNK_ROWS", "5000"))
+CHUNK_CONCURRENCY = int(os.getenv("PREDICTION_CHUNK_CONCURRENCY", "4"))
 
-    if not checklist.exists():
-        checklist.touch()
+def _manifest_conn():
+    from airflow.providers.postgres.hooks.postgres import PostgresHook
+    return PostgresHook(postgres_conn_id=MANIFEST_CONN_ID).get_conn()
 
-    with open(checklist, 'r') as f:
-        processed = set(line.strip() for line in f)
+def _check_for_new_data():
+    from pathlib import Path
+    from modules.data_zones.zones import ZONE_PATTERNS
+    from modules.prediction_manifest.manifest import ensure_manifest, register_files, import_checklist, claim_files
 
-    new_files = [str(file) for file in files if str(file) not in processed]
+    folder = Path('/opt/airflow/data/good_data')
+    checklist = folder / 'prediction_checklist.txt'
 
-    if new_files:
-        ti.xcom_push(key='predict_new_files', value=new_files)
-    else:
+    conn = _manifest_conn()
+    try:
+        ensure_manifest(conn)
+        # Both CSV and Parquet good_data files, whichever DATA_ZONE_FORMAT wrote them
+        registered = sum(register_files(conn, folder, pattern) for pattern in ZONE_PATTERNS)
+        if checklist.exists():
+            import_checklist(conn, checklist)
+        # Claimed files are in_flight and invisible to other runs until marked done/failed
+        new_files = claim_files(conn)
+    finally:
+        conn.close()
+
+    print(f"📒 Manifest: {registered} new/changed file(s), {len(new_files)} claimed")
+    if not new_files:
         raise AirflowSkipException("No new good_data files to predict")
+    # One mapped make_predictions task per file
+    return [{"path": path} for path in new_files]
 
-def _make_predictions(ti):
-    import duckdb
+def _predict_session():
     import requests
-    import pandas as pd
-    from pathlib import Path
-    import os
-    import json
-    from airflow.hooks.base import BaseHook
-
-    def handle_200(new_files):
-        with open('/opt/airflow/data/good_data/prediction_checklist.txt', 'a') as f:
-            for file in new_files:
-                f.write(file + '\n')
-
-    def handle_400():
-        raise AirflowFailException("Bad request (400/422)")
-
-    def handle_500():
-        raise AirflowException("Server error (500)")
-
-    # Load files
-    new_files = ti.xcom_pull(task_ids='check_for_new_data', key='predict_new_files')
-    quoted = ', '.join(f"'{path}'" for path in new_files)
-
-    conn = duckdb.connect()
-    df = conn.execute(f"SELECT * FROM read_csv_auto([{quoted}]);").fetchdf()
-
-    payload = { "features": df.to_dict(orient="records") }
-
-    app_conn = BaseHook.get_connection("http_conn_fastapi")
-    url = f"http://host.docker.internal:8000/predict"
-    response = requests.post(url, json=payload)
-
-    # Handle response
-    handlers = {
-        200: lambda: (
-            handle_200(new_files),
-            save_predictions(df, response.json(), new_files)
-        ),
-        400: handle_400,
-        422: handle_400,
-        500: handle_500,
-    }
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    # Pooled connections shared by the chunk threads; transient server errors are retried per chunk,
+    # so one failing request re-sends its own rows instead of the whole file
+    retry = Retry(
+        total=3,
+        backoff_factor=1,
+        status_forcelist=[500, 502, 503, 504],
+        allowed_methods=["POST"],
+        raise_on_status=False,
+    )
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_maxsize=CHUNK_CONCURRENCY, max_retries=retry))
+    return session
+
+def _predict_chunk(session, chunk, player_ids):
+    import pyarrow as pa
+
+    # Send the chunk as an Arrow IPC stream instead of per-row JSON dicts (column names once, binary values)
+    # player_id travels along so the API can store it with each persisted prediction
+    table = pa.Table.from_pandas(chunk.assign(player_id=player_ids.values), preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    arrow_stream = "application/vnd.apache.arrow.stream"
+    response = session.post(
+        f"{API_URL}/predict",
+        params={"schema_version": "fifa-v1", "model": "fifa_overall"},
+        data=sink.getvalue().to_pybytes(),
+        headers={"Content-Type": arrow_stream, "Accept": arrow_stream},
+    )
 
-    handler = handlers.get(response.status_code)
-    if handler:
-        handler()
-    else:
-        print(f"Unknown status code: {response.status_code}")
+    if response.status_code in (400, 422):
+        raise AirflowFailException(f"Bad request ({response.status_code}): {response.text[:500]}")
+    if response.status_code != 200:
+        raise AirflowException(f"Server error ({response.status_code})")
+    return pa.ipc.open_stream(response.content).read_all().to_pandas()
 
-def save_predictions(df, predictions, input_files):
+def _make_predictions(path):
+    import duckdb
     import pandas as pd
+    from concurrent.futures import ThreadPoolExecutor
+    from pathlib import Path
+    from modules.data_zones.zones import read_relation
+    from modules.prediction_manifest.manifest import mark_done, mark_failed
+
+    def set_state(mark, *args):
+        conn = _manifest_conn()
+        try:
+            mark(conn, [path], *args)
+        finally:
+            conn.close()
+
+    # One mapped task per claimed file
+    name = Path(path).name
+    # Parquet good_data is read with its stored schema; CSV still goes through type inference
+    df = duckdb.connect().execute(f"SELECT * FROM {read_relation(path)};").fetchdf()
+
+    # Stable per-player ids (<file>:<row>) so the similarity index can upsert re-sent players
+    player_ids = name + ":" + pd.Series(range(len(df))).astype(str)
+
+    if df.empty:
+        print(f"⚠️ {name} has no rows, nothing to predict")
+        set_state(mark_done)
+        return
+
+    # Fixed-size chunks sent concurrently; results come back in chunk order
+    starts = range(0, len(df), CHUNK_ROWS)
+    session = _predict_session()
+    try:
+        with ThreadPoolExecutor(max_workers=CHUNK_CONCURRENCY) as pool:
+            results = list(pool.map(
+                lambda start: _predict_chunk(
+                    session, df.iloc[start:start + CHUNK_ROWS], player_ids.iloc[start:start + CHUNK_ROWS]
+                ),
+                starts,
+            ))
+    except AirflowFailException as e:
+        # Not retried: record the failure so the file is not claimed again
+        set_state(mark_failed, str(e))
+        raise
+    finally:
+        session.close()
+
+    # Rows failing the API's schema checks come back with an error instead of failing the batch
+    predictions = pd.concat(results, ignore_index=True)
+    scored = predictions["error"].isna().to_numpy()
+    for row_number, error in zip(predictions.index[~scored], predictions["error"][~scored]):
+        print(f"⚠️ {name} row {row_number} rejected: {error}")
+
+    scored_df = df[scored].reset_index(drop=True)
+    scored_ids = player_ids[scored].reset_index(drop=True)
+    # The ids go into the predicted file too: rejected rows leave gaps, so rebuilding ids from
+    # row positions in that file would not match the ids indexed here
+    scored_df["player_id"] = scored_ids
+    save_predictions(scored_df, predictions["predicted_overall"][scored].tolist(), path)
+    update_similarity_index(scored_df, scored_ids)
+    # Outputs are written before the file is marked done, so a failed save leaves it claimable
+    set_state(mark_done)
+
+def save_predictions(df, overall_scores, input_path):
     from pathlib import Path
+    from modules.data_zones.zones import partition_of, write_frame, zone_path
 
-    # Ensure destination directory exists
-    Path("/opt/airflow/data/predicted_data").mkdir(parents=True, exist_ok=True)
+    df["predicted_overall"] = overall_scores
 
-    if isinstance(predictions, dict): predictions = [predictions]  # single record handling
+    # Each input file gets an output with its own rows only, in the input's ingestion date partition
+    name = Path(input_path).name
+    out_path = zone_path("/opt/airflow/data/predicted_data", f"predicted_{name}", partition_of(input_path))
+    write_frame(df, out_path)
+    print(f"✅ Saved prediction: {out_path}")
 
-    overall_scores = [p.get("predicted_overall") for p in predictions]
-    df["predicted_overall"] = overall_scores
+def _api_auth_headers():
+    import requests
+    from airflow.hooks.base import BaseHook
 
-    # Save one output per input file
-    for input_path in input_files:
-        name = Path(input_path).name
-        out_path = Path("/opt/airflow/data/predicted_data") / f"predicted_{name}"
-        df.to_csv(out_path, index=False)
-        print(f"✅ Saved prediction: {out_path}")
+    # Log in as the service account to get a short-lived bearer token
+    conn = BaseHook.get_connection(API_CONN_ID)
+    response = requests.post(f"{API_URL}/login", json={"username": conn.login, "password": conn.password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def update_similarity_index(df, player_ids):
+    import requests
+    from airflow.exceptions import AirflowNotFoundException
+
+    # Append the freshly scored players to the API's similarity index (no full rebuild)
+    players = df.assign(player_id=player_ids.values)
+    players = players.astype(object).where(players.notna(), None).to_dict(orient="records")
+    try:
+        response = requests.post(
+            f"{API_URL}/similar_players/index", json={"players": players}, headers=_api_auth_headers()
+        )
+        response.raise_for_status()
+        print(f"✅ Indexed {len(players)} players for similarity search")
+    except (requests.RequestException, AirflowNotFoundException) as e:
+        # Predictions are already saved; a stale similarity index must not fail (and re-run) the task
+        print(f"⚠️ Similarity index update failed: {e}")
 
 # DAG configuration
 args = {
@@ -116,9 +208,9 @@ with DAG(
         python_callable=_check_for_new_data
     )
 
-    make_predictions = PythonOperator(
+    make_predictions = PythonOperator.partial(
         task_id="make_predictions",  # ✅ fixed name
         python_callable=_make_predictions
-    )
+    ).expand(op_kwargs=check_for_new_data.output)
 
     check_for_new_data >> make_predictions
\ No newline at end of file
@@ -1,2 +0,0 @@
-random_file=$(cd $AIRFLOW_HOME/data/raw_data && shuf -e -n 1 $(realpath *.csv))
-echo "$random_file"
\ No newline at end of file
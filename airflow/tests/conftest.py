@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The DAG modules are imported the way Airflow sees them, with dags/ on the path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "dags"))
@@ -0,0 +1,85 @@
+# The native engine promises the result GXValidateDataFrameOperator would give for the same
+# staged file. Runs only where great_expectations is installed (the Airflow image has it).
+import math
+from pathlib import Path
+
+import pytest
+
+gx = pytest.importorskip("great_expectations")
+gxe = pytest.importorskip("great_expectations.expectations")
+
+from modules.ingestion_staging.staging import StagingArea
+from modules.native_validation.engine import definitions_from_gx_suite, validate_relation
+
+FIXTURE = Path(__file__).parent / "fixtures" / "native_validation_parity.csv"
+COLUMNS = ["player", "preferred_foot", "weak_foot", "skill_rating", "pace", "age"]
+# Result keys save_file and parse_gxe_output read, plus the ones the native engine fills in
+COMPARED_KEYS = [
+    "observed_value", "element_count", "missing_count", "missing_percent",
+    "unexpected_count", "unexpected_percent", "unexpected_percent_total", "unexpected_percent_nonmissing",
+    "unexpected_index_list", "partial_unexpected_index_list", "partial_unexpected_list",
+]
+
+
+def _suite():
+    # Each column exercises a case where DuckDB and pandas see the data differently: NaN in a
+    # DOUBLE column, an integer column with nulls (float64 in pandas), numbers in a text column
+    return gx.ExpectationSuite(name="native_validation_parity", expectations=[
+        gxe.ExpectTableColumnCountToEqual(value=len(COLUMNS)),
+        gxe.ExpectTableColumnsToMatchSet(column_set=COLUMNS),
+        gxe.ExpectColumnValuesToBeInSet(column="preferred_foot", value_set=["Left", "Right"]),
+        gxe.ExpectColumnValuesToBeInSet(column="weak_foot", value_set=[1, 2, 3, 4]),
+        gxe.ExpectColumnValuesToBeInSet(column="skill_rating", value_set=[1, 2, 3]),
+        gxe.ExpectColumnValuesToBeBetween(column="age", min_value=16, max_value=40),
+        gxe.ExpectColumnValuesToBeBetween(column="skill_rating", min_value=1, max_value=3, strict_max=True),
+        gxe.ExpectColumnValuesToMatchRegex(column="skill_rating", regex=r"^\d+(\.\d+)?$"),
+        gxe.ExpectColumnValuesToMatchRegex(column="pace", regex=r"^\d+(\.\d+)?$"),
+        gxe.ExpectColumnValuesToBeOfType(column="skill_rating", type_="float"),
+        gxe.ExpectColumnValuesToBeOfType(column="weak_foot", type_="int"),
+        gxe.ExpectColumnValuesToBeOfType(column="pace", type_="float"),
+        gxe.ExpectColumnValuesToBeOfType(column="preferred_foot", type_="str"),
+        *[gxe.ExpectColumnValuesToNotBeNull(column=col) for col in COLUMNS],
+    ])
+
+
+def _key(expectation):
+    kwargs = {k: v for k, v in expectation["kwargs"].items() if k != "batch_id" and v is not None}
+    return expectation["expectation_type"], repr(sorted(kwargs.items()))
+
+
+def _normalized(value):
+    # NaN never equals itself; both engines mean "missing" by it
+    if isinstance(value, list):
+        return [_normalized(v) for v in value]
+    if isinstance(value, float):
+        return None if math.isnan(value) else pytest.approx(value)
+    return value
+
+
+def test_native_engine_matches_gx(tmp_path):
+    staging = StagingArea(tmp_path)
+    key = staging.stage("parity", str(FIXTURE))
+    suite = _suite()
+
+    with staging.connect(key) as conn:
+        native = validate_relation(conn, "staged", definitions_from_gx_suite(suite))
+
+    context = gx.get_context(mode="ephemeral")
+    batch = (
+        context.data_sources.add_pandas("parity")
+        .add_dataframe_asset("staged")
+        .add_batch_definition_whole_dataframe("whole")
+        .get_batch(batch_parameters={"dataframe": staging.dataframe(key)})
+    )
+    reference = batch.validate(suite, result_format="COMPLETE").describe_dict()
+
+    assert native["success"] == reference["success"]
+    assert native["statistics"] == pytest.approx(reference["statistics"])
+    expected = {_key(e): e for e in reference["expectations"]}
+    assert len(expected) == len(native["expectations"])
+    for result in native["expectations"]:
+        gx_result = expected[_key(result)]
+        label = (result["expectation_type"], result["kwargs"].get("column"))
+        assert result["success"] == gx_result["success"], label
+        for name in COMPARED_KEYS:
+            assert _normalized(result["result"].get(name)) == _normalized(gx_result["result"].get(name)), (label, name)
@@ -0,0 +1,23 @@
+import requests
+
+# Client side of the resumable batch-job upload (PUT /predict/jobs/{id}/upload); the API app keeps
+# its own copy, since the two apps are deployed separately
+UPLOAD_CHUNK_BYTES = 4 * 1024 * 1024
+
+
+def upload_in_chunks(jobs_url: str, job_id: str, file_obj, chunk_bytes: int = UPLOAD_CHUNK_BYTES) -> int:
+    # The server only accepts a chunk at its current offset; on a 409 it reports how much it
+    # already has and the upload resumes from there
+    file_obj.seek(0)
+    offset = 0
+    while True:
+        chunk = file_obj.read(chunk_bytes)
+        if not chunk:
+            return offset
+        response = requests.put(f"{jobs_url}/{job_id}/upload", params={"offset": offset}, data=chunk)
+        if response.status_code == 409:
+            offset = response.json()["detail"]["uploaded_bytes"]
+            file_obj.seek(offset)
+            continue
+        response.raise_for_status()
+        offset = response.json()["uploaded_bytes"]
@@ -1,6 +1,6 @@
 import traceback
 from datetime import datetime, timedelta
-from io import StringIO
+from urllib.parse import urlencode
 
 import streamlit as st
 import pandas as pd
@@ -15,6 +15,25 @@ st.sidebar.markdown('### Select date range for predictions:')
 tomorrow = datetime.now() + timedelta(days=1)
 start_date = st.sidebar.date_input('From', datetime(2025, 3, 1))
 end_date = st.sidebar.date_input('To', tomorrow)
+position = st.sidebar.text_input('Position (optional)')
+nationality = st.sidebar.text_input('Nationality (optional)')
+page_size = st.sidebar.slider('Rows per page', 100, 5000, 1000, step=100)
+
+# The server filters and paginates; only the selected page is transferred.
+# Changing any filter starts again from the first page.
+filters = {
+    "from": datetime.combine(start_date, datetime.min.time()).isoformat(),
+    "to": datetime.combine(end_date + timedelta(days=1), datetime.min.time()).isoformat(),
+    "limit": page_size,
+}
+if position:
+    filters["position"] = position
+if nationality:
+    filters["nationality"] = nationality
+if st.session_state.get('past_predictions_filters') != filters:
+    st.session_state['past_predictions_filters'] = filters
+    st.session_state['past_predictions_cursors'] = [None]
+cursors = st.session_state['past_predictions_cursors']
 
 # API URL resolution
 try:
@@ -26,25 +45,32 @@ except KeyError:
 
 # Request and filtering
 try:
-    response = requests.get(url)
+    params = dict(filters)
+    if cursors[-1]:
+        params["cursor"] = cursors[-1]
+    response = requests.get(url, params=params)
     if response.status_code == 200:
-        df = pd.read_json(StringIO(response.text), orient='records')
-
-        # Ensure timestamp is datetime
-        df['insertion_timestamp'] = pd.to_datetime(df['insertion_timestamp'])
+        page = response.json()
+        filtered_df = pd.DataFrame(page["predictions"])
+        if not filtered_df.empty:
+            filtered_df['insertion_timestamp'] = pd.to_datetime(filtered_df['insertion_timestamp'])
 
-        # Filter by date
-        filtered_df = df[
-            (df['insertion_timestamp'] >= pd.to_datetime(start_date)) &
-            (df['insertion_timestamp'] <= pd.to_datetime(end_date))
-        ].reset_index(drop=True)
-
-        st.success(f"✅ Showing {len(filtered_df)} predictions between {start_date} and {end_date}")
+        st.success(f"✅ Showing {len(filtered_df)} predictions between {start_date} and {end_date} (page {len(cursors)})")
         st.dataframe(filtered_df)
 
-        # Optional CSV download
-        csv = filtered_df.to_csv(index=False).encode("utf-8")
-        st.download_button("📥 Download CSV", data=csv, file_name="past_predictions.csv", mime="text/csv")
+        prev_col, next_col = st.columns(2)
+        if len(cursors) > 1 and prev_col.button("⬅️ Previous page"):
+            cursors.pop()
+            st.rerun()
+        if page["next_cursor"] and next_col.button("Next page ➡️"):
+            cursors.append(page["next_cursor"])
+            st.rerun()
+
+        # Downloads stream straight from the API's export endpoint (every page, not just this one)
+        export_filters = {k: v for k, v in filters.items() if k != "limit"}
+        csv_col, parquet_col = st.columns(2)
+        csv_col.link_button("📥 Download CSV", f"{url}/export?{urlencode({**export_filters, 'format': 'csv'})}")
+        parquet_col.link_button("📥 Download Parquet", f"{url}/export?{urlencode({**export_filters, 'format': 'parquet'})}")
 
     else:
         st.error(f"❌ Request failed: {response.status_code}")
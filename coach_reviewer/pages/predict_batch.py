@@ -1,13 +1,17 @@
+import io
+import time
+
 import streamlit as st
 import pandas as pd
 import requests
-import json
+
+from batch_job_client import upload_in_chunks
 
 st.set_page_config(page_title="Batch Player Prediction", page_icon="📄")
 
 st.title("Player Prediction (Batch CSV)")
 
-ENDPOINT = "/predict"
+ENDPOINT = "/predict/jobs"
 base_url = st.session_state.get("base_url", "http://localhost:8000")
 url = base_url + ENDPOINT
 
@@ -21,16 +25,29 @@ if uploaded_file:
         st.subheader("Preview of Uploaded Data")
         st.dataframe(df.head())
 
-        # Send to API
-        response = requests.post(url, json={"features": df.to_dict(orient="records")})
-        if response.status_code == 200:
-            predictions = response.json()
-            scores = [r["predicted_overall"] for r in predictions]
-            df["predicted_overall"] = scores
+        # Send to API as a batch job and poll its progress
+        job = requests.post(url, json={"model": "fifa_overall", "schema_version": "fifa-v1"}).json()
+        upload_in_chunks(url, job["job_id"], uploaded_file)
+        requests.post(f"{url}/{job['job_id']}/start").raise_for_status()
+
+        progress = st.progress(0.0, text="Scoring...")
+        while job["state"] not in ("done", "failed"):
+            time.sleep(1)
+            job = requests.get(f"{url}/{job['job_id']}").json()
+            progress.progress(min(job["rows_processed"] / max(len(df), 1), 1.0),
+                              text=f"Scored {job['rows_processed']} of {len(df)} rows")
+
+        if job["state"] == "done":
+            response = requests.get(f"{url}/{job['job_id']}/results")
+            result_df = pd.read_csv(io.StringIO(response.text))
             st.success("✅ Batch prediction completed")
-            st.dataframe(df)
+            rejected = result_df["error"].notna()
+            if rejected.any():
+                st.warning(f"{rejected.sum()} row(s) failed validation and were not scored")
+            st.dataframe(result_df)
+            st.link_button("⬇️ Download predictions", f"{url}/{job['job_id']}/results")
         else:
-            st.error("❌ API call failed")
-            st.text(f"Status Code: {response.status_code}")
+            st.error("❌ Prediction job failed")
+            st.text(job["error"])
     except Exception as e:
         st.error(f"Upload or Prediction Error: {e}")
\ No newline at end of file
@@ -17,22 +17,36 @@ NUMERIC_COLS = [
     "movement_agility", "movement_reactions", "movement_balance", "power_shot_power", "power_jumping",
     "power_stamina", "power_strength", "power_long_shots", "mentality_aggression",
     "mentality_interceptions", "mentality_positioning", "mentality_vision", "mentality_penalties",
-    "mentality_composure", "defending_standing_tackle", "defending_sliding_tackle", "potential"
+    "mentality_composure", "defending_standing_tackle", "defending_sliding_tackle", "potential",
+    "weak_foot", "skill_moves"
 ]
 
+# Defaults that fall inside the API's "fifa-v1" ranges (everything else starts at 50)
+NUMERIC_DEFAULTS = {"age": 25.0, "height_cm": 180.0, "weight_kg": 75.0, "potential": 70.0, "weak_foot": 3.0, "skill_moves": 3.0}
+
 CATEGORICAL_COLS = {
     "preferred_foot": ["Left", "Right"],
-    "main_position": ["CB", "LB", "RB", "CDM", "CM", "CAM", "LW", "RW", "ST"],
+    "main_position": ["GK", "CB", "LB", "RB", "CM", "CDM", "CAM", "LW", "RW", "ST"],
     "att_work_rate": ["Low", "Medium", "High"],
     "def_work_rate": ["Low", "Medium", "High"],
-    "nationality_grouped": ["France", "Brazil", "Spain", "Germany", "Argentina", "Portugal", "Netherlands", "Other"]
+    "nationality_grouped": ["Argentina", "Brazil", "Portugal", "Poland", "Other"]
 }
 
+
+def show_prediction(result):
+    # /predict answers {"predictions": [...], "rejected": [...]} with per-row indexes
+    if result.get("predictions"):
+        st.success("🎯 Prediction Successful")
+        st.metric("Predicted Overall", round(result["predictions"][0]["predicted_overall"], 2))
+    for rejected in result.get("rejected", []):
+        st.error(f"❌ Row {rejected['index']} rejected: " + "; ".join(rejected["errors"]))
+
 # 🧮 Form Input
 with st.form("individual_form"):
     st.subheader("⚙️ Enter Player Features")
 
-    numeric_inputs = {col: st.number_input(f"{col.replace('_', ' ').title()}", value=50.0) for col in NUMERIC_COLS}
+    numeric_inputs = {col: st.number_input(f"{col.replace('_', ' ').title()}", value=NUMERIC_DEFAULTS.get(col, 50.0))
+                      for col in NUMERIC_COLS}
     categorical_inputs = {col: st.selectbox(f"{col.replace('_', ' ').title()}", options)
                           for col, options in CATEGORICAL_COLS.items()}
 
@@ -42,19 +56,9 @@ with st.form("individual_form"):
 if submit_btn:
     player_features = {**numeric_inputs, **categorical_inputs}
     try:
-        response = requests.post(url, json={"features": [player_features]})
+        response = requests.post(url, json={"schema_version": "fifa-v1", "features": [player_features]})
         if response.status_code == 200:
-            result = response.json()
-
-            if isinstance(result, list) and len(result) > 0 and "predicted_overall" in result[0]:
-                st.success("🎯 Prediction Successful")
-                st.metric("Predicted Overall", round(result[0]["predicted_overall"], 2))
-            elif isinstance(result, dict) and "predicted_overall" in result:
-                st.success("🎯 Prediction Successful")
-                st.metric("Predicted Overall", round(result["predicted_overall"], 2))
-            else:
-                st.warning("✅ Unexpected response format:")
-                st.write(result)
+            show_prediction(response.json())
         else:
             st.error(f"❌ API returned status: {response.status_code}")
     except Exception as e:
@@ -75,22 +79,9 @@ if st.button("📨 Predict from Pasted JSON"):
         if not isinstance(parsed["features"][0], dict):
             raise ValueError("Each feature must be a dict")
 
-        response = requests.post(url, json=parsed)
+        response = requests.post(url, json={"schema_version": "fifa-v1", **parsed})
         if response.status_code == 200:
-            result = response.json()
-
-            if isinstance(result, list) and len(result) > 0 and "predicted_overall" in result[0]:
-                prediction_value = result[0]["predicted_overall"]
-            elif isinstance(result, dict) and "predicted_overall" in result:
-                prediction_value = result["predicted_overall"]
-            else:
-                st.warning("✅ Unexpected response format:")
-                st.write(result)
-                prediction_value = None
-
-            if prediction_value is not None:
-                st.success("🎯 Predicted Overall")
-                st.metric("Overall", round(prediction_value, 2))
+            show_prediction(response.json())
         else:
             st.error(f"❌ API Error: {response.status_code}")
     except Exception as e:
@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 import requests
+from urllib.parse import urlencode
 
 st.set_page_config(page_title="Top Similar Players", page_icon="🎯")
 st.title("🔁 Find Similar Players by Stats")
@@ -18,21 +19,25 @@ except Exception:
 @st.cache_data
 def fetch_players():
     try:
-        response = requests.get(f"{base_url}/past-predictions")
+        # One page of players is enough to pick a reference player from
+        response = requests.get(f"{base_url}/past-predictions", params={"limit": 500})
         if response.status_code == 200:
-            return response.json()
+            return response.json()["predictions"]
     except:
         return []
     return []
 
 players = fetch_players()
+# The similarity index knows players by player_id; predictions without one (individual
+# predictions) are never indexed, so they can't be a reference player
 player_id_to_label = {
-    p["id"]: f'Player {p["id"]} | {p["features"].get("main_position", "")} | Overall: {p.get("predicted_overall", "")}'
+    p["player_id"]: f'Player {p["player_id"]} | {p["features"].get("main_position", "")} | Overall: {p.get("predicted_overall", "")}'
     for p in players
+    if p.get("player_id")
 }
 
 if not player_id_to_label:
-    st.warning("No past predictions found. Please predict a player first.")
+    st.warning("No indexed players found. Run the prediction DAG to score and index players first.")
 else:
     with st.form("similar_form"):
         reference_id = st.selectbox(
@@ -67,8 +72,8 @@ else:
                     st.success(f"✅ Top {top_n} similar players to Player {reference_id}")
                     st.dataframe(df)
 
-                    csv = df.to_csv(index=False).encode("utf-8")
-                    st.download_button("📥 Download CSV", data=csv, file_name="similar_players.csv", mime="text/csv")
+                    # The API renders the CSV, so the file is never built in the Streamlit process
+                    st.link_button("📥 Download CSV", f"{url}?{urlencode({**params, 'format': 'csv'})}")
             else:
                 st.error(f"❌ API Error: {response.status_code}")
         except Exception as e: